@@ -0,0 +1,278 @@
+"""
+Benchmark suite for the search algorithms.
+
+Runs every search on the bundled maps and on generated ones, recording wall
+time, nodes expanded, frontier pushes and peak memory per case:
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json --threshold 0.2
+
+In compare mode any node count more than --threshold above the baseline is
+reported as a regression and the exit code is 1. Counts are the same on every
+machine; wall time and memory are not, so they are only compared with --timing,
+and then only when they are worse by more than a fixed margin as well.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from controller import SearchStats
+from grid import Grid, ResumableDistance, distance_fields
+from mapgen import generate_map, write_map
+from planner import create_controller
+from reservations import ReservationTable
+from search import PRIORITY
+from sipp import SafeIntervalSearch
+
+BUNDLED_MAPS = [f"assets/maps/map{n}.txt" for n in range(1, 6)]
+
+
+def run_ticks(controller, ticks=20):
+    """
+    Plan level 4 and simulate a number of ticks, replanning as agents arrive.
+    """
+    result = controller.plan_paths_multi()
+    for agent in controller.agents:
+        controller.render.set_path(agent.id, agent.path)
+    for _ in range(ticks):
+        controller.move_multi_agents()
+        controller.render.update_path_progress()
+    return result
+
+
+# (name, level, runner) for every benchmarked search
+CASES = [
+    ("BFS", 1, lambda c, p: c.BFS()),
+    ("DFS", 1, lambda c, p: c.DFS()),
+    ("UCS", 1, lambda c, p: c.UCS(float("inf"))),
+    ("GBFS", 1, lambda c, p: c.GBFS()),
+    ("A*", 1, lambda c, p: c.a_star(float("inf"), float("inf"))),
+    ("JPS", 1, lambda c, p: c.JPS()),
+    ("Bi-BFS", 1, lambda c, p: c.bidirectional_BFS()),
+    ("Bi-A*", 1, lambda c, p: c.bidirectional_a_star()),
+    ("Race", 1, lambda c, p: c.race(float("inf"), float("inf"))),
+    ("UCS", 2, lambda c, p: c.UCS(p.time_limit)),
+    ("A*", 2, lambda c, p: c.a_star(p.time_limit, float("inf"))),
+    ("A*", 3, lambda c, p: c.a_star(p.time_limit, p.fuel_limit)),
+    # The same searches on a binary heap instead of the default bucket queue
+    ("UCS (heap)", 2, lambda c, p: c.UCS(p.time_limit, frontier=PRIORITY)),
+    (
+        "A* (heap)",
+        3,
+        lambda c, p: c.a_star(p.time_limit, p.fuel_limit, frontier=PRIORITY),
+    ),
+    ("A* (F)", 3, lambda c, p: c.a_star_stations(p.time_limit, p.fuel_limit)),
+    ("Race", 3, lambda c, p: c.race(p.time_limit, p.fuel_limit)),
+    (
+        "a_star_multi",
+        4,
+        lambda c, p: c.a_star_multi(p.main_agent, c.reservations, 0),
+    ),
+    ("plan_paths_multi", 4, lambda c, p: c.plan_paths_multi()),
+    ("move_multi_agents", 4, lambda c, p: run_ticks(c)),
+    ("A* (P)", 4, lambda c, p: c.plan_paths_multi()),
+    ("CBS", 4, lambda c, p: c.plan_paths_multi()),
+]
+
+# Metrics compared against the baseline
+COUNT_METRICS = ["expanded", "pushed"]
+# Compared with --timing only, and only when worse by this much on top of the
+# threshold, so that noise on cases of a few milliseconds is not reported
+TIMING_MARGINS = {"seconds": 0.005, "peak_kb": 64}
+# Cases only compared by time, their counts depend on which process wins
+TIMED_ONLY = {"Race"}
+
+
+def check_cheap_wait():
+    """
+    S has to let another agent off the goal at step 4. Its way runs through a
+    fuel station costing 6 time per step, so with 14 time the wait is only
+    affordable on the cell before the station.
+    """
+    rows = [
+        ["0", "0", "0", "S", "-1", "G"],
+        ["-1", "-1", "-1", "0", "0", "F5"],
+    ] + [["-1"] * 6 for _ in range(4)]
+    grid = Grid(rows, 6, 6)
+    goal = grid.index((0, 5))
+    reservations = ReservationTable(["S", "S1"])
+    reservations.reserve(goal, 4, "S1")
+    search = SafeIntervalSearch(
+        grid, SearchStats(), reservations, "S", ResumableDistance(grid, goal), 14, 5
+    )
+    result = search.find_path(grid.index((0, 3)), goal, 0)
+    cells = [(0, 3), (1, 3), (1, 4), (1, 4), (1, 5), (0, 5)]
+    if result is None or [grid.coords[cell] for cell in result[0]] != cells:
+        return f"expected {cells}, got {result}"
+    return None
+
+
+# (name, check) for paths the searches have to find, returning an error or None
+CHECKS = [
+    ("SIPP waits on the cheaper cell", check_cheap_wait),
+]
+
+
+def run_checks():
+    """
+    Run every check and return the list of (name, error) failures.
+    """
+    failures = []
+    for name, check in CHECKS:
+        error = check()
+        print(f"{'CHECK ' + name:50} {'FAILED' if error else 'ok'}")
+        if error:
+            failures.append((name, error))
+    return failures
+
+
+def generated_maps(directory, sizes, seed):
+    paths = []
+    for size in sizes:
+        time_limit, fuel_limit, map = generate_map(
+            size, size, seed=seed, fuel_stations=size // 10, agents=size // 10
+        )
+        path = os.path.join(directory, f"generated_{size}x{size}_seed{seed}.txt")
+        with open(path, "w") as file:
+            write_map(file, size, size, time_limit, fuel_limit, map)
+        paths.append(path)
+    return paths
+
+
+def run_case(map_path, name, level, runner, repeat, seed):
+    """
+    Run one case and return its metrics, with the median time of the repeated
+    runs. Timing and memory are measured in separate runs because tracemalloc
+    slows the search down. Every run starts with an empty distance-field cache.
+    """
+    times = []
+    for _ in range(repeat):
+        controller = create_controller(map_path, level, name)
+        distance_fields.clear()
+        random.seed(seed)
+        start_time = time.perf_counter()
+        result = runner(controller, controller.render.game_parameter)
+        times.append(time.perf_counter() - start_time)
+
+    controller = create_controller(map_path, level, name)
+    distance_fields.clear()
+    random.seed(seed)
+    tracemalloc.start()
+    runner(controller, controller.render.game_parameter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": statistics.median(times),
+        "expanded": controller.stats.expanded,
+        "pushed": controller.stats.pushed,
+        "peak_kb": peak // 1024,
+        "found": bool(result and result[0]),
+    }
+
+
+def run_suite(map_paths, repeat, seed, only=None):
+    results = {}
+    for map_path in map_paths:
+        map_name = os.path.splitext(os.path.basename(map_path))[0]
+        for name, level, runner in CASES:
+            if only and name not in only:
+                continue
+            case_id = f"{map_name}/level{level}/{name}"
+            # Controller reports failures with print; keep the report readable
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    results[case_id] = run_case(
+                        map_path, name, level, runner, repeat, seed
+                    )
+                finally:
+                    sys.stdout = stdout
+            metrics = results[case_id]
+            print(
+                f"{case_id:50} {metrics['seconds'] * 1000:10.2f} ms "
+                f"{metrics['expanded']:9} exp {metrics['pushed']:9} push "
+                f"{metrics['peak_kb']:8} KB"
+            )
+    return results
+
+
+def compare(results, baseline, threshold, timing=False):
+    """
+    Return a list of (case_id, metric, baseline, current) regressions. Wall
+    time and peak memory are only compared when timing is set.
+    """
+    regressions = []
+    for case_id, metrics in results.items():
+        if case_id not in baseline:
+            continue
+        name = case_id.split("/", 2)[2]
+        compared = [] if name in TIMED_ONLY else COUNT_METRICS
+        if timing:
+            compared = compared + list(TIMING_MARGINS)
+        for metric in compared:
+            old, new = baseline[case_id][metric], metrics[metric]
+            margin = TIMING_MARGINS.get(metric, 0)
+            if new > old * (1 + threshold) and new > old + margin:
+                regressions.append((case_id, metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search algorithms.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[50, 100],
+        help="sizes of the generated square maps",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case")
+    parser.add_argument("--only", nargs="+", help="only run these searches")
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="compare the results with this baseline file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed relative slowdown"
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="also compare wall time and peak memory, which depend on the machine",
+    )
+    args = parser.parse_args(argv)
+
+    failures = run_checks()
+    with tempfile.TemporaryDirectory() as directory:
+        map_paths = BUNDLED_MAPS + generated_maps(directory, args.sizes, args.seed)
+        results = run_suite(map_paths, args.repeat, args.seed, args.only)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    for name, error in failures:
+        print(f"FAILED {name}: {error}")
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold, args.timing)
+        for case_id, metric, old, new in regressions:
+            print(f"REGRESSION {case_id} {metric}: {old} -> {new}")
+        if regressions or failures:
+            sys.exit(1)
+        print("No regressions.")
+    elif failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
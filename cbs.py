@@ -0,0 +1,278 @@
+import heapq
+
+from conflicts import ConflictIndex
+
+
+def first_conflict(path1, path2):
+    """
+    Return the earliest conflict between two paths as (t, pos1, pos2, prev1, prev2)
+    or None. pos1 == pos2 for a vertex conflict, otherwise the agents swap cells.
+    """
+    for t in range(min(len(path1), len(path2))):
+        if path1[t] == path2[t]:
+            return t, path1[t], path2[t], None, None
+        if t > 0 and path1[t] == path2[t - 1] and path1[t - 1] == path2[t]:
+            return t, path1[t], path2[t], path1[t - 1], path2[t - 1]
+    return None
+
+
+class CBSSolver:
+    """
+    Conflict-Based Search for the agents of level 4.
+
+    The high level searches a constraint tree: every node holds one path per
+    agent and the constraints that produced them, and the cheapest node (sum of
+    path lengths) with a conflict is split in two, forbidding the conflicting
+    cell or move to one agent in each child. The low level is a space-time A*
+    that honors those constraints, the time and fuel limits and the existing
+    reservations.
+
+    The main agent is planned beforehand and passed in as fixed_path: it is
+    never constrained, and every other agent has to stay clear of it.
+    """
+
+    def __init__(
+        self,
+        grid,
+        stats,
+        reservations,
+        time_step_start,
+        time_limit,
+        fuel_limit,
+        fixed_path,
+        max_nodes=1000,
+        max_low_level=10000,
+    ):
+        self.grid = grid
+        self.stats = stats  # SearchStats of the owning Controller
+        self.reservations = reservations
+        self.time_step_start = time_step_start
+        self.time_limit = time_limit
+        self.fuel_limit = fuel_limit
+        self.max_nodes = max_nodes  # Constraint tree nodes before giving up
+        self.max_low_level = max_low_level  # States expanded per low-level search
+        self.nodes = 0
+
+        # Cells and moves of the main agent, off limits to everyone else
+        self.fixed_path = [grid.index(pos) for pos in fixed_path]
+        self.fixed_cells = set(enumerate(self.fixed_path))
+        self.fixed_moves = {
+            (t, self.fixed_path[t - 1], cell)
+            for t, cell in enumerate(self.fixed_path)
+            if t > 0
+        }
+
+    def low_level(self, agent_id, start, goal, search, constraints, others=None):
+        """
+        Space-time A* from start to goal, avoiding the forbidden (t, cell) and
+        (t, from_cell, to_cell) entries of constraints. Among paths of equal
+        length it prefers the one with the fewest conflicts with the paths in
+        the ConflictIndex others. Return (cells, time_left, fuel_left) or None.
+        """
+        grid = self.grid
+        stats = self.stats
+        neighbors = grid.neighbors
+        time_costs = grid.time_cost
+        fuel_stations = grid.fuel_station
+        fixed_cells = self.fixed_cells
+        fixed_moves = self.fixed_moves
+        is_reserved = self.reservations.is_reserved
+        distance = search.distance
+        lookup = search.lookup
+        other_cells = others.cells if others else {}
+        other_moves = others.moves if others else {}
+        if lookup(start) < 0:
+            return None
+
+        pq = [(lookup(start), 0, 0, start, self.time_limit, self.fuel_limit, 0)]
+        came_from = {}
+        visited = set()
+        expanded = 0
+
+        while pq and expanded < self.max_low_level:
+            _, current_hits, current_g, current, current_time, current_fuel, t = (
+                heapq.heappop(pq)
+            )
+            state = (current, current_time, current_fuel, t)
+            if current == goal:
+                cells = [current]
+                while state in came_from:
+                    state = came_from[state]
+                    cells.append(state[0])
+                return cells[::-1], current_time, current_fuel
+
+            if state in visited:
+                continue
+            visited.add(state)
+            expanded += 1
+            stats.expanded += 1
+
+            next_t = t + 1
+            # Include waiting as an option
+            for next_pos in neighbors[current] + (current,):
+                if (next_t, next_pos) in fixed_cells:
+                    continue
+                if (next_t, next_pos) in constraints:
+                    continue
+                if (next_t, next_pos, current) in fixed_moves:
+                    continue  # Would swap cells with the main agent
+                if (next_t, current, next_pos) in constraints:
+                    continue
+                if is_reserved(next_pos, self.time_step_start + next_t, agent_id):
+                    continue
+
+                new_time = current_time - time_costs[next_pos]
+                new_fuel = current_fuel - 1
+                if fuel_stations[next_pos]:
+                    new_fuel = self.fuel_limit
+                if new_fuel < 0 or new_time < 0:
+                    continue
+                h = distance[next_pos]
+                if h < 0:
+                    h = lookup(next_pos)
+                if h < 0 or h > new_time:
+                    continue  # Every step costs at least one unit of time
+
+                new_state = (next_pos, new_time, new_fuel, next_t)
+                # Every move takes one step, so g == t and the first push is the best
+                if new_state in visited or new_state in came_from:
+                    continue
+                came_from[new_state] = state
+
+                # Count the conflicts with the other agents' current paths
+                hits = current_hits
+                for other_id in other_cells.get((next_t, next_pos), ()):
+                    if other_id != agent_id:
+                        hits += 1
+                for other_id in other_moves.get((next_t, next_pos, current), ()):
+                    if other_id != agent_id:
+                        hits += 1
+
+                heapq.heappush(
+                    pq,
+                    (
+                        current_g + 1 + h,
+                        hits,
+                        current_g + 1,
+                        next_pos,
+                        new_time,
+                        new_fuel,
+                        next_t,
+                    ),
+                )
+                stats.pushed += 1
+
+        return None
+
+    def solve(self, agents):
+        """
+        Plan agents, a list of (agent_id, start, goal, search), free of conflicts.
+        Return {agent_id: (cells, time_left, fuel_left)} for the agents that can
+        reach their goal, or None if the node limit is hit first.
+        """
+        goals = {}
+        constraints = {}
+        plans = {}
+        for agent_id, start, goal, search in agents:
+            goals[agent_id] = (start, goal, search)
+            constraints[agent_id] = frozenset()
+            plan = self.low_level(agent_id, start, goal, search, frozenset())
+            if plan is not None:
+                plans[agent_id] = plan
+
+        # Nodes are ordered by cost, then by the number of conflicting pairs
+        counter = 0  # Tie breaker, the constraint dicts do not compare
+        index = self.index_plans(plans)
+        pq = [
+            (self.cost(plans), self.count_conflicts(index), counter, constraints, plans)
+        ]
+        while pq and self.nodes < self.max_nodes:
+            cost, _, _, constraints, plans = heapq.heappop(pq)
+            self.nodes += 1
+
+            index = self.index_plans(plans)
+            conflict = self.find_conflict(index)
+            if conflict is None:
+                return plans
+            conflict_count = self.count_conflicts(index)
+
+            children = []
+            for agent_id, constraint in conflict:
+                child_constraints = dict(constraints)
+                child_constraints[agent_id] = constraints[agent_id] | {constraint}
+                start, goal, search = goals[agent_id]
+                plan = self.low_level(
+                    agent_id, start, goal, search, child_constraints[agent_id], index
+                )
+                if plan is None:
+                    continue  # This branch leaves the agent without a path
+                child_plans = dict(plans)
+                child_plans[agent_id] = plan
+                child_conflicts = (
+                    conflict_count
+                    - len(index.conflicts.get(agent_id, ()))
+                    + len(index.conflicts_with(plan[0], agent_id))
+                )
+                children.append(
+                    (
+                        self.cost(child_plans),
+                        child_conflicts,
+                        child_constraints,
+                        child_plans,
+                    )
+                )
+
+            # Bypass: a child as cheap as this node but with fewer conflicts
+            # replaces the node's plans instead of splitting the tree
+            for child_cost, child_conflicts, _, child_plans in children:
+                if child_cost == cost and child_conflicts < conflict_count:
+                    children = [(cost, child_conflicts, constraints, child_plans)]
+                    break
+
+            for child_cost, child_conflicts, child_constraints, child_plans in children:
+                counter += 1
+                heapq.heappush(
+                    pq,
+                    (
+                        child_cost,
+                        child_conflicts,
+                        counter,
+                        child_constraints,
+                        child_plans,
+                    ),
+                )
+
+        return None
+
+    def cost(self, plans):
+        return sum(len(cells) - 1 for cells, _, _ in plans.values())
+
+    def index_plans(self, plans):
+        index = ConflictIndex()
+        for agent_id, (cells, _, _) in plans.items():
+            index.update(agent_id, cells)
+        return index
+
+    def count_conflicts(self, index):
+        return sum(len(others) for others in index.conflicts.values()) // 2
+
+    def find_conflict(self, index):
+        """
+        Return the earliest conflict between any two agents as the two
+        (agent_id, constraint) branches that resolve it, or None.
+        """
+        earliest = None
+        for agent1 in sorted(index.conflicts):
+            for agent2 in sorted(index.conflicts[agent1]):
+                if agent2 < agent1:
+                    continue  # Each pair once
+                found = first_conflict(index.paths[agent1], index.paths[agent2])
+                if earliest is None or found[0] < earliest[0][0]:
+                    earliest = (found, agent1, agent2)
+        if earliest is None:
+            return None
+
+        (t, pos1, pos2, prev1, prev2), agent1, agent2 = earliest
+        if prev1 is None:
+            return [(agent1, (t, pos1)), (agent2, (t, pos2))]
+        return [(agent1, (t, prev1, pos1)), (agent2, (t, prev2, pos2))]
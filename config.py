@@ -7,6 +7,32 @@ import random
 SCREEN_SIZE = 600
 FPS = 60
 
+# Define the simulation steps per second, and the most steps run to catch up before
+# a frame is drawn (F toggles fast-forward, which steps as fast as it can)
+TICK_RATE = 2
+MAX_TICKS_PER_FRAME = 10
+
+# Define the path cache (set a file name to keep planned paths between runs)
+PATH_CACHE_SIZE = 256
+PATH_CACHE_FILE = None
+
+# Define the worker processes of the parallel level-4 planner (None: one per core)
+PLANNING_WORKERS = None
+
+# Define the time budget of "Race" in seconds (None: the first path found wins)
+RACE_BUDGET = None
+
+# Define how the map is drawn: "rects" draws every cell with its label and grid
+# lines, "array" paints the cell colors from a NumPy array in one scaled blit, and
+# "auto" uses "array" once cells are smaller than ARRAY_RENDER_CELL_SIZE pixels
+RENDER_MODE = "auto"
+ARRAY_RENDER_CELL_SIZE = 12
+
+# Define the zoom limits and the smallest cells that still show labels and grid lines
+MAX_CELL_SIZE = 64
+LABEL_MIN_CELL_SIZE = 12
+GRID_LINE_MIN_CELL_SIZE = 4
+
 # Define font parameters
 FONT_SMALL = "Arial"
 FONT_MEDIUM = "assets/fonts/Kanit.ttf"
@@ -25,6 +51,14 @@ TIME_COLOR = "#A3BDF0"
 FUEL_COLOR = "#F0CFA3"
 PATH_COLOR = "#FF0000"
 
+# Define the algorithms each level can be solved with
+LEVEL_ALGORITHMS = {
+    1: ["BFS", "DFS", "UCS", "GBFS", "A*", "JPS", "Bi-BFS", "Bi-A*", "Race"],
+    2: ["UCS", "A*", "Race"],
+    3: ["A*", "A* (F)", "Race"],
+    4: ["A*", "A* (P)", "CBS"],
+}
+
 
 def check_and_install_packages():
     """
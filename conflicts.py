@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+
+class ConflictIndex:
+    """
+    Vertex and swap conflicts between the timed paths of level 4.
+
+    Every path is indexed by the cell it holds at each timestep and by the move
+    it makes into that step, so adding a path finds all of its conflicts with
+    hash lookups in O(len(path)) instead of comparing it with every other path
+    at every step. Replacing a path only drops its own entries and conflict
+    pairs, so only the paths that changed need to be indexed again.
+
+    Moving into the cell another agent leaves at the same step is not a
+    conflict: agents move in lockstep in move_multi_agents.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.cells = defaultdict(list)  # (t, cell) -> agents holding it
+        self.moves = defaultdict(list)  # (t, from, to) -> agents making the move
+        self.conflicts = defaultdict(set)  # agent -> agents it conflicts with
+
+    def add_conflict(self, agent_id, other_id):
+        self.conflicts[agent_id].add(other_id)
+        self.conflicts[other_id].add(agent_id)
+
+    def update(self, agent_id, path):
+        """
+        Index path as the path of agent_id, replacing its previous one.
+        """
+        self.remove(agent_id)
+        self.paths[agent_id] = path
+        cells = self.cells
+        moves = self.moves
+
+        for t, pos in enumerate(path):
+            # Vertex conflicts: another agent in the same cell at the same step
+            occupants = cells[(t, pos)]
+            for other_id in occupants:
+                self.add_conflict(agent_id, other_id)
+            occupants.append(agent_id)
+
+            if t == 0:
+                continue
+            prev_pos = path[t - 1]
+
+            # Swap conflicts: another agent making the opposite move
+            for other_id in moves.get((t, pos, prev_pos), ()):
+                if other_id != agent_id:
+                    self.add_conflict(agent_id, other_id)
+            moves[(t, prev_pos, pos)].append(agent_id)
+
+    def conflicts_with(self, path, agent_id=None):
+        """
+        Return the indexed agents, other than agent_id, that path has a vertex
+        or swap conflict with, without indexing it.
+        """
+        found = set()
+        cells = self.cells
+        moves = self.moves
+        for t, pos in enumerate(path):
+            found.update(cells.get((t, pos), ()))
+            if t > 0:
+                found.update(moves.get((t, pos, path[t - 1]), ()))
+        found.discard(agent_id)
+        return found
+
+    def remove(self, agent_id):
+        path = self.paths.pop(agent_id, None)
+        if path is None:
+            return
+
+        for t, pos in enumerate(path):
+            key = (t, pos)
+            self.cells[key].remove(agent_id)
+            if not self.cells[key]:
+                del self.cells[key]
+            if t > 0:
+                key = (t, path[t - 1], pos)
+                self.moves[key].remove(agent_id)
+                if not self.moves[key]:
+                    del self.moves[key]
+
+        # Every conflict of the agent involved its old path
+        for other_id in self.conflicts.pop(agent_id, ()):
+            self.conflicts[other_id].discard(agent_id)
+            if not self.conflicts[other_id]:
+                del self.conflicts[other_id]
+
+    def snapshot(self):
+        """
+        Return a copy of the current conflicts as {agent: set of agents}.
+        """
+        return {
+            agent_id: set(others) for agent_id, others in self.conflicts.items()
+        }
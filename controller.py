@@ -1,9 +1,43 @@
-from render import *
 import heapq
-from collections import deque, defaultdict
+from functools import partial
 import math
+import os
 import random
 
+from cbs import CBSSolver
+from conflicts import ConflictIndex
+from grid import DIRECTIONS, ResumableDistance
+from portfolio import Portfolio
+from reservations import ReservationTable
+from search import (
+    BUCKET,
+    CLOSE_ON_POP,
+    FIFO,
+    LABELS,
+    LIFO,
+    BestFirstSearch,
+    StepCost,
+    TimedCost,
+    TimeFuelCost,
+)
+from sipp import SafeIntervalSearch
+from speculative import fits, plan_speculatively
+from stations import StationGraph
+
+
+class SearchStats:
+    """
+    Counters filled in by the searches, used by the benchmark suite.
+    """
+
+    def __init__(self):
+        self.expanded = 0  # States taken off the frontier and expanded
+        self.pushed = 0  # States pushed onto the frontier
+
+    def reset(self):
+        self.expanded = 0
+        self.pushed = 0
+
 
 class Controller:
     def __init__(self, render):
@@ -11,9 +45,25 @@ class Controller:
         self.rows = self.render.game_parameter.rows
         self.cols = self.render.game_parameter.cols
         self.map = self.render.game_parameter.map
+        self.grid = self.render.game_parameter.grid
+        self.stats = SearchStats()
+        self.station_graph = None  # Level-3 station graph, kept while the query is unchanged
+        self.path_cache = None  # Optional PathCache shared between sessions
+        self.portfolio = Portfolio()  # Runs "Race", share one to pool its win counts
+        self.agent_searches = {}  # Level 4: agent id -> ResumableDistance to its goal
+        self.agent_replans = {}  # Level 4: agent id -> (inputs, result) of its last replan
+        self.out_of_reach = {}  # Level 4: (start, goal) -> station field it failed with
+        self.planning_workers = None  # Level 4 "A* (P)": processes, None for every core
         self.agents = self.render.game_parameter.agents
         self.main_agent = self.render.game_parameter.main_agent
 
+        # Level 4: every agent's path_all, kept in step as paths are assigned
+        self.reservations = ReservationTable(agent.id for agent in self.agents)
+        for agent in self.agents:
+            self.reservations.reserve_path(
+                [self.grid.index(pos) for pos in agent.path_all], 0, agent.id
+            )
+
     def find_positions(self):
         start, goal = None, None
         for i in range(self.rows):
@@ -24,9 +74,6 @@ class Controller:
                     goal = (i, j)
         return start, goal
 
-    def heuristic(self, current, goal):
-        return abs(current[0] - goal[0]) + abs(current[1] - goal[1])
-
     def reconstruct_path(self, came_from, current):
         path = []
         while current in came_from:
@@ -35,218 +82,391 @@ class Controller:
         path.append(current)
         return path[::-1]
 
-    def BFS(self):
+    def search_positions(self):
+        """
+        Return the start and goal of the map as grid indices, or None if either
+        is missing.
+        """
         start, goal = self.find_positions()
         if not start or not goal:
             return None
+        return self.grid.index(start), self.grid.index(goal)
 
-        queue = deque([(start)])
-        visited = set([start])
-        came_from = {}
-
-        while queue:
-            current = queue.popleft()
-            if current == goal:
-                return self.reconstruct_path(came_from, current)
-
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                if (
-                    0 <= next_pos[0] < self.rows
-                    and 0 <= next_pos[1] < self.cols
-                    and next_pos not in visited
-                    and self.map[next_pos[0]][next_pos[1]] != "-1"
-                ):
-                    queue.append(next_pos)
-                    visited.add(next_pos)
-                    came_from[next_pos] = current
+    def BFS(self):
+        positions = self.search_positions()
+        if positions is None:
+            return None
 
-        return None  # No path found
+        grid = self.grid
+        search = BestFirstSearch(grid, self.stats, StepCost(grid), frontier=FIFO)
+        path = search.run(*positions)
+        return [grid.coords[index] for index in path] if path else None
 
     def DFS(self):
-        start, goal = self.find_positions()
-        if not start or not goal:
+        positions = self.search_positions()
+        if positions is None:
             return None
 
-        stack = [(start)]
-        visited = set([start])
-        came_from = {}
+        grid = self.grid
+        search = BestFirstSearch(grid, self.stats, StepCost(grid), frontier=LIFO)
+        path = search.run(*positions)
+        return [grid.coords[index] for index in path] if path else None
 
-        while stack:
-            current = stack.pop()
-            if current == goal:
-                return self.reconstruct_path(came_from, current)
+    def UCS(self, time_limit, frontier=BUCKET):
+        positions = self.search_positions()
+        if positions is None:
+            return None
 
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                if (
-                    0 <= next_pos[0] < self.rows
-                    and 0 <= next_pos[1] < self.cols
-                    and next_pos not in visited
-                    and self.map[next_pos[0]][next_pos[1]] != "-1"
-                ):
-                    stack.append(next_pos)
-                    visited.add(next_pos)
-                    came_from[next_pos] = current
+        grid = self.grid
+        # Fuel is unlimited, so only time_left tells labels apart
+        cost_model = TimeFuelCost(grid, time_limit, math.inf)
+        search = BestFirstSearch(
+            grid, self.stats, cost_model, frontier=frontier, closed=LABELS
+        )
+        path = search.run(*positions)
+        if path is None:
+            return None  # No path found that meets the constraints
+        path = [cost_model.unpack(state) for state in path]
+        return [(grid.coords[index], t) for index, t, _ in path], path[-1][1]
 
-        return None  # No path found
+    def GBFS(self):
+        positions = self.search_positions()
+        if positions is None:
+            return None
 
-    def UCS(self, time_limit):
+        grid = self.grid
+        search = BestFirstSearch(
+            grid,
+            self.stats,
+            StepCost(grid),
+            closed=CLOSE_ON_POP,
+            heuristic=partial(grid.heuristic, goal_index=positions[1]),
+            greedy=True,
+        )
+        path = search.run(*positions)
+        return [grid.coords[index] for index in path] if path else None
+
+    def JPS(self):
+        """
+        Jump Point Search for the uniform-cost 4-connected grid of level 1.
+        Only jump points go through the heap; straight runs between them are
+        scanned without being pushed.
+        """
         start, goal = self.find_positions()
         if not start or not goal:
             return None
 
-        pq = [(0, start, time_limit)]  # (cost, position, time_left)
+        grid = self.grid
+        stats = self.stats
+        start, goal = grid.index(start), grid.index(goal)
+
+        pq = [(grid.heuristic(start, goal), 0, start)]
+        g_score = {start: 0}
         came_from = {}
-        cost_so_far = {(start, time_limit): 0}
 
         while pq:
-            current_cost, current, current_time = heapq.heappop(pq)
+            _, current_g, current = heapq.heappop(pq)
+            if current_g > g_score[current]:
+                continue
+            stats.expanded += 1
 
-            if current == goal and current_time >= 0:
-                path = self.reconstruct_path(came_from, (current, current_time))
-                return path, current_time
+            if current == goal:
+                jump_points = self.reconstruct_path(came_from, current)
+                return self.expand_jump_points(jump_points)
+
+            for d in self.jps_directions(current, came_from.get(current)):
+                jump_point = self.jump(current, d, goal)
+                if jump_point is None:
+                    continue
+                tentative_g_score = current_g + grid.heuristic(current, jump_point)
+                if jump_point not in g_score or tentative_g_score < g_score[jump_point]:
+                    g_score[jump_point] = tentative_g_score
+                    came_from[jump_point] = current
+                    heapq.heappush(
+                        pq,
+                        (
+                            tentative_g_score + grid.heuristic(jump_point, goal),
+                            tentative_g_score,
+                            jump_point,
+                        ),
+                    )
+                    stats.pushed += 1
 
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
+        return None  # No path found
+
+    def jps_directions(self, current, parent):
+        if parent is None:
+            return DIRECTIONS
+
+        i, j = self.grid.coords[current]
+        pi, pj = self.grid.coords[parent]
+        di = (i > pi) - (i < pi)
+        dj = (j > pj) - (j < pj)
+        if dj:
+            # Arrived horizontally: keep going, or turn up/down
+            return [(0, dj), (1, 0), (-1, 0)]
+        return [(di, 0), (0, 1), (0, -1)]
+
+    def walkable(self, i, j):
+        return (
+            0 <= i < self.rows
+            and 0 <= j < self.cols
+            and self.grid.passable[i * self.cols + j]
+        )
+
+    def jump(self, current, d, goal):
+        """
+        Scan from current in direction d and return the next jump point, or None.
+        """
+        walkable = self.walkable
+        i, j = self.grid.coords[current]
+        di, dj = d
+        while True:
+            i, j = i + di, j + dj
+            if not walkable(i, j):
+                return None
+            index = i * self.cols + j
+            if index == goal:
+                return index
+
+            if dj:
+                # Forced neighbor: a cell above/below that was blocked one step back
+                if (walkable(i - 1, j) and not walkable(i - 1, j - dj)) or (
+                    walkable(i + 1, j) and not walkable(i + 1, j - dj)
+                ):
+                    return index
+            else:
+                if (walkable(i, j - 1) and not walkable(i - di, j - 1)) or (
+                    walkable(i, j + 1) and not walkable(i - di, j + 1)
+                ):
+                    return index
+                # Vertical runs stop wherever a horizontal scan finds a jump point
                 if (
-                    0 <= next_pos[0] < self.rows
-                    and 0 <= next_pos[1] < self.cols
-                    and self.map[next_pos[0]][next_pos[1]] != "-1"
+                    self.jump(index, (0, 1), goal) is not None
+                    or self.jump(index, (0, -1), goal) is not None
                 ):
-                    cell_value = self.map[next_pos[0]][next_pos[1]]
-                    time_cost = 1  # Default time cost for normal cells
-
-                    if cell_value.isdigit():
-                        time_cost += int(cell_value)
-                    elif cell_value.startswith("F"):
-                        time_cost += int(cell_value[1:])
-
-                    new_time = current_time - time_cost
-                    new_cost = current_cost + 1
-
-                    if (
-                        next_pos,
-                        new_time,
-                    ) not in cost_so_far or new_cost < cost_so_far[
-                        (next_pos, new_time)
-                    ]:
-                        cost_so_far[(next_pos, new_time)] = new_cost
-                        priority = new_cost
-                        heapq.heappush(pq, (priority, next_pos, new_time))
-                        came_from[(next_pos, new_time)] = (current, current_time)
-
-        return None  # No path found that meets the constraints
-
-    def GBFS(self):
+                    return index
+
+    def expand_jump_points(self, jump_points):
+        coords = self.grid.coords
+        path = [coords[jump_points[0]]]
+        for index in jump_points[1:]:
+            i, j = path[-1]
+            ti, tj = coords[index]
+            di = (ti > i) - (ti < i)
+            dj = (tj > j) - (tj < j)
+            while (i, j) != (ti, tj):
+                i, j = i + di, j + dj
+                path.append((i, j))
+        return path
+
+    def bidirectional_BFS(self):
+        """
+        Breadth-first search from both ends of the level-1 grid, one full layer
+        at a time from the smaller frontier.
+        """
         start, goal = self.find_positions()
         if not start or not goal:
             return None
 
-        pq = [(self.heuristic(start, goal), start)]
-        visited = set()
-        came_from = {}
-
-        while pq:
-            _, current = heapq.heappop(pq)
-
-            if current == goal:
-                return self.reconstruct_path(came_from, current)
-
-            if current in visited:
-                continue
-            visited.add(current)
-
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                if (
-                    0 <= next_pos[0] < self.rows
-                    and 0 <= next_pos[1] < self.cols
-                    and next_pos not in visited
-                    and self.map[next_pos[0]][next_pos[1]] != "-1"
-                ):
-                    heapq.heappush(pq, (self.heuristic(next_pos, goal), next_pos))
-                    came_from[next_pos] = current
+        grid = self.grid
+        stats = self.stats
+        neighbors = grid.neighbors
+        start, goal = grid.index(start), grid.index(goal)
+        if start == goal:
+            return [grid.coords[start]]
+
+        parents = ({start: None}, {goal: None})
+        depths = ({start: 0}, {goal: 0})
+        frontiers = [[start], [goal]]
+
+        while frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own_parents, own_depths = parents[side], depths[side]
+            other_depths = depths[1 - side]
+
+            # Finish the whole layer so the best meeting cell is found
+            best, meet = math.inf, None
+            next_frontier = []
+            for current in frontiers[side]:
+                stats.expanded += 1
+                next_depth = own_depths[current] + 1
+                for next_pos in neighbors[current]:
+                    if next_pos in own_depths:
+                        continue
+                    own_parents[next_pos] = current
+                    own_depths[next_pos] = next_depth
+                    next_frontier.append(next_pos)
+                    stats.pushed += 1
+                    if next_pos in other_depths:
+                        total = next_depth + other_depths[next_pos]
+                        if total < best:
+                            best, meet = total, next_pos
+
+            if meet is not None:
+                return self.join_paths(parents, meet)
+            frontiers[side] = next_frontier
 
-        return None  # No path found.
+        return None  # No path found
 
-    def a_star(self, time_limit, fuel_limit):
+    def bidirectional_a_star(self):
+        """
+        Front-to-end bidirectional A* for level 1: the forward search aims at the
+        goal, the backward search at the start, both with Manhattan distance.
+        """
         start, goal = self.find_positions()
         if not start or not goal:
             return None
 
-        pq = [
-            (0, 0, start, time_limit, fuel_limit)
-        ]  # (f_score, g_score, position, time_left, fuel_left)
-        visited = set()
-        came_from = {}
-        g_score = {(start, time_limit, fuel_limit): 0}
-        f_score = {(start, time_limit, fuel_limit): self.heuristic(start, goal)}
-
-        while pq:
-            _, current_g, current, current_time, current_fuel = heapq.heappop(pq)
+        grid = self.grid
+        stats = self.stats
+        neighbors = grid.neighbors
+        heuristic = grid.heuristic
+        start, goal = grid.index(start), grid.index(goal)
+
+        parents = ({start: None}, {goal: None})
+        g_score = ({start: 0}, {goal: 0})
+        targets = (goal, start)
+        # Ordered by f, then highest g, so ties go to the cells closest to the target
+        pqs = (
+            [(heuristic(start, goal), 0, start)],
+            [(heuristic(goal, start), 0, goal)],
+        )
+        best, meet = (0, start) if start == goal else (math.inf, None)
 
-            if current == goal:
-                path = self.reconstruct_path(
-                    came_from, (current, current_time, current_fuel)
-                )
-                return path, current_time, current_fuel
+        while pqs[0] and pqs[1]:
+            # Neither frontier can improve on the best meeting any more
+            if best <= max(pqs[0][0][0], pqs[1][0][0]):
+                break
 
-            state = (current, current_time, current_fuel)
-            if state in visited:
+            side = 0 if len(pqs[0]) <= len(pqs[1]) else 1
+            pq, own_g, other_g = pqs[side], g_score[side], g_score[1 - side]
+            _, current_g, current = heapq.heappop(pq)
+            current_g = -current_g
+            if current_g > own_g[current]:
                 continue
-            visited.add(state)
-
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                if (
-                    0 <= next_pos[0] < self.rows
-                    and 0 <= next_pos[1] < self.cols
-                    and self.map[next_pos[0]][next_pos[1]] != "-1"
-                ):
+            stats.expanded += 1
+
+            for next_pos in neighbors[current]:
+                tentative_g_score = current_g + 1
+                if next_pos not in own_g or tentative_g_score < own_g[next_pos]:
+                    own_g[next_pos] = tentative_g_score
+                    parents[side][next_pos] = current
+                    heapq.heappush(
+                        pq,
+                        (
+                            tentative_g_score + heuristic(next_pos, targets[side]),
+                            -tentative_g_score,
+                            next_pos,
+                        ),
+                    )
+                    stats.pushed += 1
+                    if next_pos in other_g:
+                        total = tentative_g_score + other_g[next_pos]
+                        if total < best:
+                            best, meet = total, next_pos
+
+        if meet is None:
+            return None  # No path found
+        return self.join_paths(parents, meet)
+
+    def join_paths(self, parents, meet):
+        """
+        Join the forward and backward parent chains that meet at a cell.
+        """
+        coords = self.grid.coords
+        path = []
+        current = meet
+        while current is not None:
+            path.append(coords[current])
+            current = parents[0][current]
+        path.reverse()
+
+        current = parents[1][meet]
+        while current is not None:
+            path.append(coords[current])
+            current = parents[1][current]
+        return path
+
+    def a_star(self, time_limit, fuel_limit, frontier=BUCKET):
+        positions = self.search_positions()
+        if positions is None:
+            return None
 
-                    cell_value = self.map[next_pos[0]][next_pos[1]]
-                    time_cost, fuel_cost = self.calculate_costs(cell_value)
+        grid = self.grid
+        # Exact steps to goal, -1 if unreachable
+        distance = grid.distance_field(positions[1])
+        cost_model = TimeFuelCost(grid, time_limit, fuel_limit)
+        search = BestFirstSearch(
+            grid,
+            self.stats,
+            cost_model,
+            frontier=frontier,
+            closed=LABELS,
+            heuristic=distance.__getitem__,
+        )
+        path = search.run(*positions)
+        if path is None:
+            return None  # No path found that meets the constraints
+        path = [cost_model.unpack(state) for state in path]
+        _, time_left, fuel_left = path[-1]
+        path = [(grid.coords[index], t, f) for index, t, f in path]
+        return path, time_left, fuel_left
+
+    def a_star_stations(self, time_limit, fuel_limit):
+        """
+        Level-3 search on the fuel-station graph, returning the same result as a_star.
+        """
+        start, goal = self.find_positions()
+        if not start or not goal:
+            return None
 
-                    new_time = current_time - time_cost
-                    new_fuel = current_fuel - fuel_cost
+        grid = self.grid
+        start, goal = grid.index(start), grid.index(goal)
+        key = (start, goal, time_limit, fuel_limit)
+        if self.station_graph is None or self.station_graph[0] != key:
+            graph = StationGraph(
+                grid, start, goal, time_limit, fuel_limit, self.stats
+            )
+            self.station_graph = (key, graph)
+        route = self.station_graph[1].solve()
+        if route is None:
+            return None
 
-                    if cell_value.startswith("F"):
-                        new_fuel = fuel_limit  # Refill fuel tank
+        # Replay the route to recover time and fuel left at every cell
+        path = [(grid.coords[start], time_limit, fuel_limit)]
+        time_left, fuel_left = time_limit, fuel_limit
+        for index in route[1:]:
+            time_left -= grid.time_cost[index]
+            fuel_left = fuel_limit if grid.fuel_station[index] else fuel_left - 1
+            path.append((grid.coords[index], time_left, fuel_left))
+        return path, time_left, fuel_left
 
-                    if new_fuel < 0 or new_time < 0:
-                        continue
+    def find_and_draw_path(self, algorithm, level, time_limit, fuel_limit):
+        time_limit = time_limit if (level > 1) else math.inf
+        fuel_limit = fuel_limit if (level > 2) else math.inf
 
-                    tentative_g_score = current_g + 1
-                    new_state = (next_pos, new_time, new_fuel)
+        if self.path_cache is None:
+            return self.find_path(algorithm, time_limit, fuel_limit)
 
-                    if (
-                        new_state not in g_score
-                        or tentative_g_score < g_score[new_state]
-                    ):
-                        came_from[new_state] = state
-                        g_score[new_state] = tentative_g_score
-                        f_score_value = tentative_g_score + self.heuristic(
-                            next_pos, goal
-                        )
-                        f_score[new_state] = f_score_value
-                        heapq.heappush(
-                            pq,
-                            (
-                                f_score_value,
-                                tentative_g_score,
-                                next_pos,
-                                new_time,
-                                new_fuel,
-                            ),
-                        )
+        start, goal = self.find_positions()
+        key = self.path_cache.make_key(
+            self.grid, algorithm, level, start, goal, time_limit, fuel_limit
+        )
+        cached = self.path_cache.get(key)
+        if cached is not None:
+            path, time_left, fuel_left = cached
+            return list(path), time_left, fuel_left
 
-        return None  # No path found that meets the constraints
+        result = self.find_path(algorithm, time_limit, fuel_limit)
+        self.path_cache.put(key, result)
+        return result
 
-    def find_and_draw_path(self, algorithm, level, time_limit, fuel_limit):
+    def find_path(self, algorithm, time_limit, fuel_limit):
         path = []
-        time_limit = time_limit if (level > 1) else math.inf
-        fuel_limit = fuel_limit if (level > 2) else math.inf
+
+        if algorithm == "Race":
+            return self.race(time_limit, fuel_limit)
 
         if algorithm == "BFS":
             result = self.BFS()
@@ -256,11 +476,19 @@ class Controller:
             result = self.UCS(time_limit)
         elif algorithm == "GBFS":
             result = self.GBFS()
+        elif algorithm == "JPS":
+            result = self.JPS()
+        elif algorithm == "Bi-BFS":
+            result = self.bidirectional_BFS()
+        elif algorithm == "Bi-A*":
+            result = self.bidirectional_a_star()
         elif algorithm == "A*":
             result = self.a_star(time_limit, fuel_limit)
+        elif algorithm == "A* (F)":
+            result = self.a_star_stations(time_limit, fuel_limit)
 
         if result:
-            if algorithm != "A*":
+            if algorithm not in ("A*", "A* (F)"):
                 if algorithm != "UCS":
                     path = result
                     time_left = time_limit
@@ -281,235 +509,142 @@ class Controller:
         else:
             return [], time_limit, fuel_limit
 
+    def race(self, time_limit, fuel_limit):
+        """
+        Race the portfolio's searches for this level in parallel and return the
+        (path, time_left, fuel_left) of the winner.
+        """
+        winner, result, expanded, pushed = self.portfolio.race(
+            self.render.game_parameter, time_limit, fuel_limit
+        )
+        self.stats.expanded += expanded
+        self.stats.pushed += pushed
+        if winner is None:
+            print("No search of the race found a path")
+        return result
+
     # For level 4 only
     def a_star_multi(self, agent, time_windows, time_step_start):
-        start = agent.position
-        goal = agent.goal
-        initial_time = self.render.game_parameter.time_limit
-        initial_fuel = self.render.game_parameter.fuel_limit
-
-        pq = [
-            (0, 0, start, initial_time, initial_fuel, time_step_start)
-        ]  # Added time step
-        visited = set()
-        came_from = {}
-        g_score = {(start, initial_time, initial_fuel, time_step_start): 0}
-        f_score = {
-            (start, initial_time, initial_fuel, time_step_start): self.heuristic(
-                start, goal
-            )
-        }
-
-        max_iterations = 1000  # Prevent infinite loops
-        iterations = 0
-
-        while pq and iterations < max_iterations:
-            iterations += 1
-            _, current_g, current, current_time, current_fuel, time_step = (
-                heapq.heappop(pq)
-            )
-
-            if current == goal:
-                path = self.reconstruct_path_multi(
-                    came_from, (current, current_time, current_fuel, time_step)
-                )
-                return path, current_time, current_fuel
-
-            state = (current, current_time, current_fuel, time_step)
-            if state in visited:
-                continue
-            visited.add(state)
-
-            for d in [
-                (0, 1),
-                (0, -1),
-                (1, 0),
-                (-1, 0),
-                (0, 0),
-            ]:  # Include waiting as an option
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                next_time_step = time_step + 1
-
-                if self.is_valid_move(next_pos, time_windows, agent.id, next_time_step):
-                    cell_value = self.map[next_pos[0]][next_pos[1]]
-                    time_cost, fuel_cost = self.calculate_costs(cell_value)
-
-                    new_time = current_time - time_cost
-                    new_fuel = current_fuel - fuel_cost
-
-                    if cell_value.startswith("F"):
-                        new_fuel = self.render.game_parameter.fuel_limit
-
-                    if new_fuel < 0 or new_time < 0:
-                        continue
-
-                    tentative_g_score = current_g + 1
-                    new_state = (next_pos, new_time, new_fuel, next_time_step)
-
-                    if (
-                        new_state not in g_score
-                        or tentative_g_score < g_score[new_state]
-                    ):
-                        came_from[new_state] = state
-                        g_score[new_state] = tentative_g_score
-                        f_score_value = tentative_g_score + self.heuristic(
-                            next_pos, goal
-                        )
-                        f_score[new_state] = f_score_value
-                        heapq.heappush(
-                            pq,
-                            (
-                                f_score_value,
-                                tentative_g_score,
-                                next_pos,
-                                new_time,
-                                new_fuel,
-                                next_time_step,
-                            ),
-                        )
-
-        return None  # No path found
+        """
+        Plan agent from its position to its goal around the reservations in
+        time_windows, starting at time_step_start. Return (path, time_left,
+        fuel_left) with one cell per time step, or None.
+        """
+        grid = self.grid
+        game_parameter = self.render.game_parameter
+        start = grid.index(agent.position)
+        goal = grid.index(agent.goal)
+        if self.out_of_reach.get((start, goal)) is grid.station_distance():
+            return None  # Cannot be reached within the limits even on an empty map
+
+        search = SafeIntervalSearch(
+            grid,
+            self.stats,
+            time_windows,
+            agent.id,
+            self.agent_distance(agent, goal),  # Resumed across replans
+            game_parameter.time_limit,
+            game_parameter.fuel_limit,
+        )
+        result = search.find_path(start, goal, time_step_start)
+        if result is None:
+            # Without reservations the search only depends on the map and the
+            # limits, so a goal that is out of reach then is never tried again
+            search.reservations = ReservationTable([agent.id])
+            if search.find_path(start, goal, time_step_start) is None:
+                self.out_of_reach[(start, goal)] = grid.station_distance()
+            return None
+        cells, time_left, fuel_left = result
+        return [grid.coords[cell] for cell in cells], time_left, fuel_left
 
     def find_alternative_path(
         self, agent, time_windows, conflicting_paths, main_agent_path, time_step_start
     ):
-        start = agent.position
-        goal = agent.goal
+        grid = self.grid
+        index = grid.index
         initial_time = self.render.game_parameter.time_limit
         initial_fuel = self.render.game_parameter.fuel_limit
-
-        pq = [(0, 0, start, initial_time, initial_fuel, time_step_start, [])]
-        visited = set()
-        came_from = {}
-        g_score = {(start, initial_time, initial_fuel, time_step_start): 0}
-        f_score = {
-            (start, initial_time, initial_fuel, time_step_start): self.heuristic(
-                start, goal
-            )
-        }
-
-        max_iterations = 10000
-        iterations = 0
-
-        while pq and iterations < max_iterations:
-            iterations += 1
-            (
-                _,
-                current_g,
-                current,
-                current_time,
-                current_fuel,
-                time_step,
-                current_path,
-            ) = heapq.heappop(pq)
-
-            if current == goal or time_step >= len(main_agent_path):
-                return (
-                    current_path + [current] * (len(main_agent_path) - time_step),
-                    current_time,
-                    current_fuel,
-                )
-
-            state = (current, current_time, current_fuel, time_step)
-            if state in visited:
-                continue
-            visited.add(state)
-
-            # Consider moving in all directions, including staying put and moving backwards
-            for d in [(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)]:
-                next_pos = (current[0] + d[0], current[1] + d[1])
-                next_time_step = time_step + 1
-
-                # Check if the move conflicts with the main agent's path
-                if (
-                    next_time_step < len(main_agent_path)
-                    and next_pos == main_agent_path[next_time_step]
-                ):
-                    continue
-
-                # Check if the move conflicts with any other agent's path
-                conflict = False
-                for path in conflicting_paths:
-                    if len(path) > next_time_step:
-                        if next_pos == path[next_time_step] or (
-                            current == path[next_time_step]
-                            and next_pos == path[next_time_step - 1]
-                        ):
-                            conflict = True
-                            break
-                if conflict:
-                    continue
-
-                if self.is_valid_move(next_pos, time_windows, agent.id, next_time_step):
-                    cell_value = self.map[next_pos[0]][next_pos[1]]
-                    time_cost, fuel_cost = self.calculate_costs(cell_value)
-
-                    new_time = current_time - time_cost
-                    new_fuel = current_fuel - fuel_cost
-
-                    if cell_value.startswith("F"):
-                        new_fuel = self.render.game_parameter.fuel_limit
-
-                    if new_fuel < 0 or new_time < 0:
-                        continue
-
-                    tentative_g_score = current_g + 1
-                    new_state = (next_pos, new_time, new_fuel, next_time_step)
-
-                    if (
-                        new_state not in g_score
-                        or tentative_g_score < g_score[new_state]
-                    ):
-                        came_from[new_state] = state
-                        g_score[new_state] = tentative_g_score
-                        f_score_value = tentative_g_score + self.heuristic(
-                            next_pos, goal
-                        )
-                        f_score[new_state] = f_score_value
-                        new_path = current_path + [current]
-                        heapq.heappush(
-                            pq,
-                            (
-                                f_score_value,
-                                tentative_g_score,
-                                next_pos,
-                                new_time,
-                                new_fuel,
-                                next_time_step,
-                                new_path,
-                            ),
-                        )
-
-        # If no path is found, return a path that stays at the current position
-        return [agent.position] * len(main_agent_path), initial_time, initial_fuel
-
-    def is_valid_move(self, pos, time_windows, agent_id, time_step):
-        if not (0 <= pos[0] < self.rows and 0 <= pos[1] < self.cols):
-            return False
-        if self.map[pos[0]][pos[1]] == "-1":
-            return False
-
-        # Check if the position is occupied by another agent at the current time step
-        if pos in time_windows and time_step in time_windows[pos]:
-            if (
-                time_windows[pos][time_step] is not None
-                and time_windows[pos][time_step] != agent_id
-            ):
+        horizon = len(main_agent_path)
+        main_cells = [index(pos) for pos in main_agent_path]
+        other_cells = [[index(pos) for pos in path] for path in conflicting_paths]
+        is_reserved = time_windows.is_reserved
+        cost_model = TimedCost(
+            grid, initial_time, initial_fuel, time_step_start, horizon
+        )
+        stride = cost_model.stride
+        step_span = cost_model.step_span
+
+        def allowed(state, next_state):
+            current = state // stride
+            next_pos = next_state // stride
+            next_time_step = time_step_start + next_state % step_span
+            # Check if the move conflicts with the main agent's path
+            if next_time_step < horizon and next_pos == main_cells[next_time_step]:
                 return False
 
-        return True
-
-    def calculate_costs(self, cell_value):
-        time_cost = 1
-        fuel_cost = 1
-        if cell_value.isdigit():
-            time_cost += int(cell_value)
-        if cell_value.startswith("F"):
-            time_cost += int(cell_value[1:])
-        return time_cost, fuel_cost
+            # Check if the move conflicts with any other agent's path
+            for cells in other_cells:
+                if len(cells) > next_time_step:
+                    if next_pos == cells[next_time_step] or (
+                        current == cells[next_time_step]
+                        and next_pos == cells[next_time_step - 1]
+                    ):
+                        return False
+
+            return not is_reserved(next_pos, next_time_step, agent.id)
+
+        goal = index(agent.goal)
+        search = BestFirstSearch(
+            grid,
+            self.stats,
+            cost_model,
+            frontier=BUCKET,
+            heuristic=self.agent_distance(agent, goal).lookup,
+            allowed=allowed,
+        )
+        path = search.run(
+            index(agent.position),
+            goal,
+            # Past the main agent's path
+            stop=lambda state: cost_model.time_step(state) >= horizon,
+            max_pops=10000,
+        )
+        if path is None:
+            # If no path is found, return a path that stays at the current position
+            return [agent.position] * horizon, initial_time, initial_fuel
+
+        current, time_left, fuel_left, time_step = cost_model.unpack(path[-1])
+        # Stay on the last cell until the main agent's path ends
+        path = [state // stride for state in path[:-1]] + [current] * (
+            horizon - time_step
+        )
+        return [grid.coords[cell] for cell in path], time_left, fuel_left
+
+    def agent_distance(self, agent, goal):
+        """
+        Return the ResumableDistance toward the agent's goal. It is kept per agent,
+        so every replan for the same goal continues the same search; a new one is
+        started only when the goal moves or the layout changes.
+        """
+        search = self.agent_searches.get(agent.id)
+        if (
+            search is None
+            or search.goal != goal
+            or search.layout is not self.grid.layout_key()
+        ):
+            search = ResumableDistance(self.grid, goal)
+            self.agent_searches[agent.id] = search
+        return search
 
     def plan_paths_multi(self):
-        time_windows = self.get_current_time_windows()
+        algorithm = self.render.game_parameter.algorithm
+        if algorithm == "CBS":
+            return self.plan_paths_cbs()
+        return self.plan_paths_prioritized(parallel=algorithm == "A* (P)")
+
+    def plan_paths_prioritized(self, parallel=False):
+        grid = self.grid
+        time_windows = self.reservations.copy()  # Scratch copy for this planning round
         paths = {}
         max_path_length = 0
 
@@ -538,15 +673,31 @@ class Controller:
 
             # Update time windows for the main agent
             for t, pos in enumerate(path):
-                time_windows[pos][t] = main_agent.id
+                time_windows.assign(grid.index(pos), t, main_agent.id)
         else:
             print("No path found for main agent")
             return None, None
 
         # Then, find initial paths for other agents
         other_agents = [agent for agent in self.agents if agent.id != "S"]
+        speculative = {}
+        if parallel:
+            speculative = self.plan_others_speculatively(
+                other_agents, time_windows, time_step_start
+            )
         for agent in other_agents:
-            result = self.a_star_multi(agent, time_windows, time_step_start)
+            if agent.id in speculative:
+                result = speculative[agent.id]
+                if result and not fits(
+                    [grid.index(pos) for pos in result[0]],
+                    time_windows,
+                    agent.id,
+                    time_step_start,
+                ):
+                    # Collides with an agent merged before it
+                    result = self.a_star_multi(agent, time_windows, time_step_start)
+            else:
+                result = self.a_star_multi(agent, time_windows, time_step_start)
             if result:
                 path, time_left, fuel_left = result
                 full_path = agent.path_all + path
@@ -558,7 +709,7 @@ class Controller:
 
                 # Update time windows for this agent
                 for t, pos in enumerate(full_path):
-                    time_windows[pos][t] = agent.id
+                    time_windows.assign(grid.index(pos), t, agent.id)
             else:
                 print(f"No initial path found for agent {agent.id}")
 
@@ -569,57 +720,148 @@ class Controller:
         for agent in self.agents:
             if agent.id in paths:
                 agent.path = paths[agent.id]
-                agent.path_all += paths[agent.id]  # Store the full path
+                self.extend_path_all(agent, paths[agent.id])  # Store the full path
             else:
                 print(f"No path found for agent {agent.id}")
 
         return main_agent.path, main_agent.goal
 
-    def detect_conflicts(self, paths, max_length):
-        conflicts = defaultdict(set)
-        for t in range(max_length):
-            positions = {}
-            for agent_id, path in paths.items():
-                if t < len(path):
-                    pos = path[t]
-                    if pos in positions:
-                        conflicts[agent_id].add(positions[pos])
-                        conflicts[positions[pos]].add(agent_id)
-                    positions[pos] = agent_id
-
-                    # Check for swap conflicts and agents passing through each other
-                    if t > 0 and t < len(path):
-                        prev_pos = path[t - 1]
-                        for other_id, other_path in paths.items():
-                            if other_id != agent_id and t < len(other_path):
-                                # Check for swap conflicts
-                                if (
-                                    prev_pos == other_path[t]
-                                    and pos == other_path[t - 1]
-                                ):
-                                    conflicts[agent_id].add(other_id)
-                                    conflicts[other_id].add(agent_id)
-
-                                # Check for agents passing through each other
-                                if t + 1 < len(path) and t + 1 < len(other_path):
-                                    if (
-                                        pos == other_path[t + 1]
-                                        and path[t + 1] == other_path[t]
-                                    ):
-                                        conflicts[agent_id].add(other_id)
-                                        conflicts[other_id].add(agent_id)
-
-        return conflicts
+    def plan_others_speculatively(self, other_agents, time_windows, time_step_start):
+        """
+        Plan other_agents in parallel against the reservations in time_windows,
+        which hold the main agent's path but not each other's. Return {agent_id:
+        a_star_multi result}. The caller merges them in agent order: a plan that
+        is still free of the agents merged before it is what a_star_multi would
+        find then as well, and only the rest have to be planned again. An agent
+        without a plan here has none with more reservations either.
+        """
+        grid = self.grid
+        game_parameter = self.render.game_parameter
+        workers = self.planning_workers or os.cpu_count() or 1
+        jobs = []
+        speculative = {}
+        for agent in other_agents:
+            start = grid.index(agent.position)
+            goal = grid.index(agent.goal)
+            if self.out_of_reach.get((start, goal)) is grid.station_distance():
+                speculative[agent.id] = None
+            else:
+                jobs.append((agent.id, start, goal))
+        if workers < 2 or len(jobs) < 2:
+            return speculative  # Nothing to gain over planning them in turn
+
+        for job, result, out_of_reach, expanded, pushed in plan_speculatively(
+            grid,
+            jobs,
+            time_windows,
+            game_parameter.time_limit,
+            game_parameter.fuel_limit,
+            time_step_start,
+            workers,
+        ):
+            agent_id, start, goal = job
+            self.stats.expanded += expanded
+            self.stats.pushed += pushed
+            if result is None:
+                if out_of_reach:
+                    self.out_of_reach[(start, goal)] = grid.station_distance()
+                speculative[agent_id] = None
+            else:
+                cells, time_left, fuel_left = result
+                speculative[agent_id] = (
+                    [grid.coords[cell] for cell in cells],
+                    time_left,
+                    fuel_left,
+                )
+        return speculative
+
+    def plan_paths_cbs(self):
+        """
+        Level-4 planning with Conflict-Based Search. The main agent is planned
+        first, as in plan_paths_prioritized, and keeps its path; CBS then plans
+        every other agent around it. Falls back to prioritized planning when
+        CBS reaches its node limit.
+        """
+        grid = self.grid
+        game_parameter = self.render.game_parameter
+
+        # Update goals for all agents
+        for agent in self.agents:
+            self.update_agent_goal(agent)
+
+        main_agent = next(agent for agent in self.agents if agent.id == "S")
+        time_step_start = next(
+            (
+                t
+                for t, pos in enumerate(self.main_agent.path)
+                if pos == self.main_agent.position
+            ),
+            0,  # Default to 0 if position not found
+        )
+        result = self.a_star_multi(main_agent, self.reservations, time_step_start)
+        if not result:
+            print("No path found for main agent")
+            return None, None
+        main_path, main_time_left, main_fuel_left = result
+
+        other_agents = [agent for agent in self.agents if agent.id != "S"]
+        solver = CBSSolver(
+            grid,
+            self.stats,
+            self.reservations,
+            time_step_start,
+            game_parameter.time_limit,
+            game_parameter.fuel_limit,
+            main_path,
+        )
+        plans = solver.solve(
+            [
+                (
+                    agent.id,
+                    grid.index(agent.position),
+                    grid.index(agent.goal),
+                    self.agent_distance(agent, grid.index(agent.goal)),
+                )
+                for agent in other_agents
+            ]
+        )
+        if plans is None:
+            print("CBS reached its node limit, using prioritized planning")
+            return self.plan_paths_prioritized()
+
+        main_agent.path = main_path
+        main_agent.time_left = main_time_left
+        main_agent.fuel_left = main_fuel_left
+        self.extend_path_all(main_agent, main_path)
+        for agent in other_agents:
+            if agent.id not in plans:
+                print(f"No path found for agent {agent.id}")
+                continue
+            cells, time_left, fuel_left = plans[agent.id]
+            agent.path = [grid.coords[cell] for cell in cells]
+            agent.time_left = time_left
+            agent.fuel_left = fuel_left
+            self.extend_path_all(agent, agent.path)
+
+        return main_agent.path, main_agent.goal
+
+    def detect_conflicts(self, paths):
+        """
+        Index paths and return the ConflictIndex of their vertex and swap conflicts.
+        """
+        index = ConflictIndex()
+        for agent_id, path in paths.items():
+            index.update(agent_id, path)
+        return index
 
     def resolve_conflicts(self, paths, time_windows, main_agent, other_agents):
         conflict_resolution_attempts = 0
         max_resolution_attempts = 100
         agent_cannot_move = []
+        conflict_index = self.detect_conflicts(paths)
 
         while conflict_resolution_attempts < max_resolution_attempts:
-            conflicts = self.detect_conflicts(
-                paths, max(len(path) for path in paths.values())
-            )
+            conflicts = conflict_index.snapshot()
             if not conflicts:
                 break
 
@@ -658,10 +900,11 @@ class Controller:
                 if not is_conflict:
                     agent.path = new_path
                     paths[agent.id] = full_path
+                    conflict_index.update(agent.id, full_path)  # Re-check only this path
 
                     # Update time windows for this agent
                     for t, pos in enumerate(full_path):
-                        time_windows[pos][t] = agent.id
+                        time_windows.assign(self.grid.index(pos), t, agent.id)
                 else:
                     agent_cannot_move.append(agent)
 
@@ -707,15 +950,15 @@ class Controller:
             new_goal = self.generate_random_goal(agent, self.main_agent.path)
             agent.goal = new_goal
             new_goal_i, new_goal_j = new_goal
-            self.map[new_goal_i][new_goal_j] = "G" + agent.id[1:]
+            self.grid.set_cell(new_goal_i, new_goal_j, "G" + agent.id[1:])
             agent.completed = False
 
         if agent.position == agent.goal:
             # Remove old start and goal positions
             old_start_i, old_start_j = agent.start
             old_goal_i, old_goal_j = agent.goal
-            self.map[old_start_i][old_start_j] = "0"
-            self.map[old_goal_i][old_goal_j] = "0"
+            self.grid.set_cell(old_start_i, old_start_j, "0")
+            self.grid.set_cell(old_goal_i, old_goal_j, "0")
 
             # Assign new start and goal positions
             new_start = agent.position
@@ -724,8 +967,8 @@ class Controller:
             agent.goal = new_goal
             new_start_i, new_start_j = new_start
             new_goal_i, new_goal_j = new_goal
-            self.map[new_start_i][new_start_j] = "S" + agent.id[1:]
-            self.map[new_goal_i][new_goal_j] = "G" + agent.id[1:]
+            self.grid.set_cell(new_start_i, new_start_j, "S" + agent.id[1:])
+            self.grid.set_cell(new_goal_i, new_goal_j, "G" + agent.id[1:])
             agent.completed = False
 
         # Clear the old path
@@ -760,9 +1003,7 @@ class Controller:
             else:
                 # If agent has no path, update its goal and recalculate path
                 self.update_agent_goal(agent)
-                result = self.a_star_multi(
-                    agent, self.get_current_time_windows(), time_step_start
-                )
+                result = self.replan_agent(agent, time_step_start)
                 if result:
                     new_path, time_left, fuel_left = result
                     agent.path = new_path
@@ -808,9 +1049,7 @@ class Controller:
             agent.completed = True if agent.position == agent.goal else False
             if agent.position == agent.goal and agent.id != "S":
                 self.update_agent_goal(agent)  # Generate new goal immediately
-                new_result = self.a_star_multi(
-                    agent, self.get_current_time_windows(), time_step_start
-                )
+                new_result = self.replan_agent(agent, time_step_start)
                 if new_result:
                     new_path, new_time_left, new_fuel_left = new_result
                     full_path = agent.path_all + new_path
@@ -821,7 +1060,7 @@ class Controller:
                         agent.path = (
                             agent.path[self.render.path_indices[agent.id] :] + new_path
                         )
-                        agent.path_all += new_path
+                        self.extend_path_all(agent, new_path)
                         agent.time_left = new_time_left
                         agent.fuel_left = new_fuel_left
                         self.render.set_path(agent.id, agent.path)
@@ -830,26 +1069,41 @@ class Controller:
                             self.render.game_parameter.time_limit - len(agent.path),
                             len(agent.path),
                         )
-                        agent.path_all += agent.path
+                        self.extend_path_all(agent, agent.path)
                         self.render.set_path(agent.id, agent.path)
 
         return self.main_agent.position, self.main_agent.completed
 
-    def get_current_time_windows(self):
-        time_windows = defaultdict(lambda: defaultdict(lambda: None))
-        for agent in self.agents:
-            full_path = agent.path_all
-
-            for t, pos in enumerate(full_path):
-                time_windows[pos][t] = agent.id
-
-        return time_windows
-
-    def reconstruct_path_multi(self, came_from, end_state):
-        path = []
-        current = end_state
-        while current in came_from:
-            path.append(current[0])
-            current = came_from[current]
-        path.append(current[0])
-        return path[::-1]
\ No newline at end of file
+    def replan_agent(self, agent, time_step_start):
+        """
+        Run a_star_multi against the reservations of every agent's path_all.
+
+        Agents without a path replan every tick; while their position, goal,
+        start step and the reservations are unchanged the search would repeat
+        itself exactly, so the previous result is returned instead.
+        """
+        inputs = (
+            agent.position,
+            agent.goal,
+            time_step_start,
+            self.reservations.version,
+        )
+        last = self.agent_replans.get(agent.id)
+        if last is not None and last[0] == inputs:
+            result = last[1]
+        else:
+            result = self.a_star_multi(agent, self.reservations, time_step_start)
+            self.agent_replans[agent.id] = (inputs, result)
+        if result:
+            path, time_left, fuel_left = result
+            return list(path), time_left, fuel_left
+        return None
+
+    def extend_path_all(self, agent, path):
+        """
+        Append path to the agent's full path and reserve its cells.
+        """
+        self.reservations.reserve_path(
+            [self.grid.index(pos) for pos in path], len(agent.path_all), agent.id
+        )
+        agent.path_all += path
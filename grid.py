@@ -0,0 +1,318 @@
+import hashlib
+from array import array
+from collections import OrderedDict, deque
+
+# Neighbor order used by every search: right, left, down, up
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+
+def calculate_costs(cell_value):
+    """
+    Return the (time cost, fuel cost) of stepping onto a cell.
+    """
+    time_cost = 1
+    fuel_cost = 1
+    if cell_value.isdigit():
+        time_cost += int(cell_value)
+    if cell_value.startswith("F"):
+        time_cost += int(cell_value[1:])
+    return time_cost, fuel_cost
+
+
+class Agent:
+    def __init__(self, id, start, goal):
+        self.id = id
+        self.position = start
+        self.start = start
+        self.goal = goal
+        self.path = []
+        self.path_all = []
+        self.completed = False
+
+    def update_goal(self, goal):
+        self.goal = goal
+
+
+def read_map(map_path, level):
+    """
+    Read a map file and return (rows, cols, time_limit, fuel_limit, map, agents, main_agent).
+
+    Cells that the given level does not use are flattened to "0". Agents and their
+    goals are only created for level 4; main_agent is None otherwise.
+    """
+    with open(map_path, "r") as file:
+        lines = file.readlines()
+
+    # First line contains rows, columns, time limit, and fuel limit
+    first_line = lines[0].strip().split()
+    rows = int(first_line[0])
+    cols = int(first_line[1])
+    time_limit = int(first_line[2])
+    fuel_limit = int(first_line[3])
+
+    map = []
+    agents = []
+    main_agent = None
+    agent_goals = {}  # use for level 4
+
+    # Read the map
+    for i, line in enumerate(lines[1:]):
+        row = line.strip().split()
+
+        if level == 1:
+            row = ["0" if cell not in ["0", "-1", "S", "G"] else cell for cell in row]
+        elif level == 2:
+            row = [
+                (
+                    "0"
+                    if not (cell.isdigit() or cell in ["0", "-1", "S", "G"])
+                    else cell
+                )
+                for cell in row
+            ]
+        elif level == 3:
+            row = [
+                (
+                    "0"
+                    if (cell.startswith("S") and cell[1:].isdigit())
+                    or (cell.startswith("G") and cell[1:].isdigit())
+                    else cell
+                )
+                for cell in row
+            ]
+        elif level == 4:
+            for j, cell in enumerate(row):
+                if cell.startswith("S") and cell != "S":
+                    agents.append(Agent(f"S{cell[1:]}", (i, j), None))
+                elif cell == "S":
+                    main_agent = Agent("S", (i, j), None)
+                    agents.append(main_agent)
+                elif cell.startswith("G"):
+                    agent_goals[cell if cell != "G" else "G"] = (i, j)
+
+        map.append(row)
+
+    # Update agent goals for level 4
+    if level == 4:
+        for agent in agents:
+            if agent.id in agent_goals:
+                agent.update_goal(agent_goals[agent.id])
+            elif agent.id.startswith("S") and "G" + agent.id[1:] in agent_goals:
+                agent.update_goal(agent_goals["G" + agent.id[1:]])
+
+    return rows, cols, time_limit, fuel_limit, map, agents, main_agent
+
+
+class Grid:
+    """
+    Compiled form of the string map used by the searches.
+
+    Cells are addressed by a flat index (i * cols + j). Passability, time cost,
+    fuel-station flags and neighbor lists are computed once here so the search
+    loops never touch the cell strings.
+    """
+
+    def __init__(self, map, rows, cols):
+        self.map = map
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+
+        self.coords = [(i, j) for i in range(rows) for j in range(cols)]
+        self.passable = bytearray(self.size)
+        self.time_cost = array("i", [0]) * self.size
+        self.fuel_station = bytearray(self.size)
+        self.neighbors = [()] * self.size
+        self.layout = None  # Bytes snapshot of passable, the distance-field cache key
+        self.content = None  # Digest of the cell strings, the path cache key
+        self.station_field = None  # Steps to the nearest fuel station
+        self.changed = None  # Set to a list to collect the (i, j) set_cell writes
+
+        for i in range(rows):
+            for j in range(cols):
+                self.compile_cell(i, j)
+        for index in range(self.size):
+            self.compile_neighbors(index)
+
+    def index(self, pos):
+        return pos[0] * self.cols + pos[1]
+
+    def compile_cell(self, i, j):
+        index = i * self.cols + j
+        cell = self.map[i][j]
+        self.passable[index] = cell != "-1"
+        self.time_cost[index] = calculate_costs(cell)[0] if cell != "-1" else 0
+        self.fuel_station[index] = cell.startswith("F")
+
+    def compile_neighbors(self, index):
+        i, j = self.coords[index]
+        neighbors = []
+        for d in DIRECTIONS:
+            ni, nj = i + d[0], j + d[1]
+            if 0 <= ni < self.rows and 0 <= nj < self.cols:
+                next_index = ni * self.cols + nj
+                if self.passable[next_index]:
+                    neighbors.append(next_index)
+        self.neighbors[index] = tuple(neighbors)
+
+    def set_cell(self, i, j, value):
+        """
+        Write a cell of the string map and recompile it (and its neighbors' lists).
+        """
+        index = i * self.cols + j
+        was_passable = self.passable[index]
+        was_station = self.fuel_station[index]
+        self.map[i][j] = value
+        self.content = None
+        if self.changed is not None:
+            self.changed.append((i, j))
+        self.compile_cell(i, j)
+
+        if (
+            self.passable[index] != was_passable
+            or self.fuel_station[index] != was_station
+        ):
+            self.station_field = None
+        if self.passable[index] != was_passable:
+            self.layout = None
+            self.compile_neighbors(index)
+            for d in DIRECTIONS:
+                ni, nj = i + d[0], j + d[1]
+                if 0 <= ni < self.rows and 0 <= nj < self.cols:
+                    self.compile_neighbors(ni * self.cols + nj)
+
+    def heuristic(self, index, goal_index):
+        i, j = self.coords[index]
+        gi, gj = self.coords[goal_index]
+        return abs(i - gi) + abs(j - gj)
+
+    def layout_key(self):
+        if self.layout is None:
+            self.layout = bytes(self.passable)
+        return self.layout
+
+    def content_key(self):
+        if self.content is None:
+            digest = hashlib.sha1()
+            for row in self.map:
+                digest.update(" ".join(row).encode())
+                digest.update(b"\n")
+            self.content = digest.hexdigest()
+        return self.content
+
+    def distance_field(self, goal_index):
+        """
+        Return the exact step distance from every cell to the goal (-1 if unreachable).
+        """
+        return distance_fields.get(self, goal_index)
+
+    def station_distance(self):
+        """
+        Return the steps from every cell to the nearest fuel station (-1 if none
+        can be reached).
+        """
+        if self.station_field is None:
+            distance = array("i", [-1]) * self.size
+            queue = deque()
+            for index in range(self.size):
+                if self.fuel_station[index]:
+                    distance[index] = 0
+                    queue.append(index)
+            neighbors = self.neighbors
+            while queue:
+                current = queue.popleft()
+                next_distance = distance[current] + 1
+                for next_pos in neighbors[current]:
+                    if distance[next_pos] < 0:
+                        distance[next_pos] = next_distance
+                        queue.append(next_pos)
+            self.station_field = distance
+        return self.station_field
+
+    def compute_distance_field(self, goal_index):
+        # Moves are symmetric, so a BFS from the goal gives the distance to it
+        distance = array("i", [-1]) * self.size
+        distance[goal_index] = 0
+        queue = deque([goal_index])
+        neighbors = self.neighbors
+        while queue:
+            current = queue.popleft()
+            next_distance = distance[current] + 1
+            for next_pos in neighbors[current]:
+                if distance[next_pos] < 0:
+                    distance[next_pos] = next_distance
+                    queue.append(next_pos)
+        return distance
+
+
+class ResumableDistance:
+    """
+    Distance field toward one goal that is only computed as far as it is read.
+
+    The BFS from the goal stops as soon as the queried cell is labelled and
+    resumes from the same frontier on the next miss, so a goal that is only
+    looked at near a few agents never pays for the whole map. Moves are
+    symmetric, which makes these labels the exact steps to the goal.
+    """
+
+    def __init__(self, grid, goal_index):
+        self.goal = goal_index
+        self.layout = grid.layout_key()  # Stale once a cell changes passability
+        self.neighbors = grid.neighbors
+        # -1 marks cells that are unreachable or not reached yet
+        self.distance = array("i", [-1]) * grid.size
+        self.distance[goal_index] = 0
+        self.queue = deque([goal_index])
+
+    def lookup(self, index):
+        """
+        Return the steps from index to the goal, or -1 if it cannot be reached.
+        """
+        distance = self.distance
+        queue = self.queue
+        neighbors = self.neighbors
+        while distance[index] < 0 and queue:
+            current = queue.popleft()
+            next_distance = distance[current] + 1
+            for next_pos in neighbors[current]:
+                if distance[next_pos] < 0:
+                    distance[next_pos] = next_distance
+                    queue.append(next_pos)
+        return distance[index]
+
+
+class DistanceFieldCache:
+    """
+    Bounded LRU cache of distance fields, keyed by the passable layout of the map
+    and the goal cell. Level 4 replans the same goals tick after tick, and every
+    new SHOW session on an unchanged map reuses the fields of the previous one.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.fields = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, grid, goal_index):
+        key = (grid.cols, grid.layout_key(), goal_index)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        field = grid.compute_distance_field(goal_index)
+        self.fields[key] = field
+        if len(self.fields) > self.maxsize:
+            self.fields.popitem(last=False)
+        return field
+
+    def clear(self):
+        self.fields.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+distance_fields = DistanceFieldCache()
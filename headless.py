@@ -0,0 +1,57 @@
+"""
+Stand-ins for the pygame GameParameter and Render, for running the Controller
+searches without a window.
+"""
+
+from grid import Agent, Grid, read_map
+
+
+class HeadlessParameter:
+    """
+    Stand-in for GameParameter that holds the map state without fonts or colors.
+    """
+
+    def __init__(self, map_path, level, algorithm):
+        self.level = level
+        self.algorithm = algorithm
+        (
+            self.rows,
+            self.cols,
+            self.time_limit,
+            self.fuel_limit,
+            self.map,
+            self.agents,
+            self.main_agent,
+        ) = read_map(map_path, level)
+        if self.main_agent is None:
+            self.main_agent = Agent("S", None, None)
+        self.grid = Grid(self.map, self.rows, self.cols)
+
+
+class HeadlessRender:
+    """
+    Stand-in for Render that only keeps the path bookkeeping used by Controller.
+    """
+
+    def __init__(self, game_parameter):
+        self.game_parameter = game_parameter
+        self.agent_paths = {agent.id: [] for agent in game_parameter.agents}
+        self.path_indices = {agent.id: 0 for agent in game_parameter.agents}
+        self.path_progress = {agent.id: 0 for agent in game_parameter.agents}
+
+    def set_path(self, agent_id, path):
+        self.agent_paths[agent_id] = path
+        self.path_indices[agent_id] = 0
+        self.path_progress[agent_id] = 0
+
+    def clear_agent_path(self, agent_id):
+        self.set_path(agent_id, [])
+
+    def update_agent_position(self, agent_id):
+        if self.path_indices[agent_id] < len(self.agent_paths[agent_id]) - 1:
+            self.path_indices[agent_id] += 1
+
+    def update_path_progress(self):
+        for agent_id in self.path_progress:
+            if self.path_progress[agent_id] < len(self.agent_paths[agent_id]) - 1:
+                self.path_progress[agent_id] += 1
@@ -1,5 +1,11 @@
+from functools import partial
+
+from render import *
 from controller import *
 from menu import *
+from path_cache import PathCache
+from portfolio import Portfolio
+from scheduler import StepScheduler
 
 
 def main():
@@ -13,6 +19,9 @@ def main():
     clock = pygame.time.Clock()
 
     game_parameter = GameParameter()
+    # Shared by every SHOW session, so unchanged queries are not planned again
+    path_cache = PathCache(PATH_CACHE_SIZE, PATH_CACHE_FILE)
+    portfolio = Portfolio(budget=RACE_BUDGET)
     game_parameter.algorithm = "A*"
 
     # Test
@@ -37,23 +46,66 @@ def main():
             render = Render(game_parameter)
             render.initialize()
             controller = Controller(render)
+            controller.path_cache = path_cache
+            controller.planning_workers = PLANNING_WORKERS
+            controller.portfolio = portfolio
 
             # Main program
             run_game(screen, clock, controller, render, game_parameter)
 
+    path_cache.close()
+    for line in portfolio.report():
+        print(line)
     pygame.quit()
 
 
+# Arrow keys and WASD scroll the map by (rows, columns)
+PAN_KEYS = {
+    pygame.K_UP: (-1, 0),
+    pygame.K_DOWN: (1, 0),
+    pygame.K_LEFT: (0, -1),
+    pygame.K_RIGHT: (0, 1),
+    pygame.K_w: (-1, 0),
+    pygame.K_s: (1, 0),
+    pygame.K_a: (0, -1),
+    pygame.K_d: (0, 1),
+}
+
+
+def step_simulation(controller, render, game_parameter):
+    """
+    Move the agents one step along their paths. Return False once the main
+    agent has reached its goal.
+    """
+    if game_parameter.level == 4:
+        new_pos, completed = controller.move_multi_agents()
+
+        # Update path progress for all agents
+        render.update_path_progress()
+        render.draw_next_step_multi()
+        if completed:
+            for agent in sorted(game_parameter.agents, key=lambda x: x.id):
+                print(agent.id)
+                print("Path: ", agent.path_all)
+            print("Main agent reached its goal!")
+            return False
+    else:
+        if render.draw_next_step():
+            render.update_path_progress()
+        else:
+            print("Main agent reached its goal!")
+            return False
+    return True
+
+
 def run_game(screen, clock, controller, render, game_parameter):
     running = True
-    step_delay = 500
-    last_step_time = 0
+    scheduler = StepScheduler(TICK_RATE, FPS, MAX_TICKS_PER_FRAME)
+    step_once = partial(step_simulation, controller, render, game_parameter)
     path_found = False
     path_exist = False
 
     while running:
-        current_time = pygame.time.get_ticks()
-
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -68,7 +120,7 @@ def run_game(screen, clock, controller, render, game_parameter):
                                     render.set_path(agent.id, agent.path)
                             path_found = True
                             path_exist = True
-                            last_step_time = current_time
+                            scheduler.start()
                         else:
                             print("No path found for main agent.")
                     else:
@@ -85,40 +137,39 @@ def run_game(screen, clock, controller, render, game_parameter):
                             print("Fuel left:", fuel_left)
                             path_found = True
                             path_exist = True
-                            last_step_time = current_time
+                            scheduler.start()
                         else:
                             if not path_exist:
                                 print("No path found.")
+                elif event.key == pygame.K_f:
+                    scheduler.fast_forward = not scheduler.fast_forward
+                    scheduler.start()
                 elif event.key == pygame.K_ESCAPE:
                     running = False
-
-        if path_found and current_time - last_step_time > step_delay:
-            if game_parameter.level == 4:
-                new_pos, completed = controller.move_multi_agents()
-
-                # Update path progress for all agents
-                render.update_path_progress()
-
-                if render.draw_next_step_multi():
-                    last_step_time = current_time
-                if completed:
-                    path_found = False
-                    for agent in sorted(game_parameter.agents, key=lambda x: x.id):
-                        print(agent.id)
-                        print("Path: ", agent.path_all)
-                    print("Main agent reached its goal!")
-            else:
-                if render.draw_next_step():
-                    last_step_time = current_time
-                    render.update_path_progress()
-                else:
-                    path_found = False
-                    print("Main agent reached its goal!")
-
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    render.zoom(1)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    render.zoom(-1)
+            elif event.type == pygame.MOUSEWHEEL:
+                x, y = pygame.mouse.get_pos()
+                if x < SCREEN_SIZE:
+                    render.zoom(event.y, (x, y))
+
+        # Scroll while pan keys are held, about a window per second
+        pressed = pygame.key.get_pressed()
+        di = sum(PAN_KEYS[key][0] for key in PAN_KEYS if pressed[key])
+        dj = sum(PAN_KEYS[key][1] for key in PAN_KEYS if pressed[key])
+        if di or dj:
+            step = max(SCREEN_SIZE // render.cell_size // FPS, 1)
+            render.move_view(di * step, dj * step)
+
+        if path_found:
+            path_found = scheduler.run(step_once)
+
+        # Presents the frame, only once whatever the number of steps run
         render.draw()
-        render.draw_grid()
-        pygame.display.flip()
-        clock.tick(60)
+        if not (scheduler.fast_forward and path_found):
+            clock.tick(FPS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""
+Seeded generator for synthetic maps in the assets/maps format.
+
+    python mapgen.py 200 200 --seed 1 --agents 20 --fuel-stations 10 --output map_200.txt
+
+Guarantees:
+- Every S<n>/G<n> cell (and S/G) is connected to S; obstacles on a random
+  monotone corridor are carved away when needed.
+- When --time-limit/--fuel-limit are not given, they are derived from the
+  minimum-time routes of S -> G and of every S<n> -> G<n>, so that each of these
+  deliveries is solvable on its own with the limits level 4 gives all agents.
+  Limits given explicitly are checked against every route and a warning is printed.
+"""
+
+import argparse
+import heapq
+import math
+import random
+import sys
+
+from grid import Grid
+
+
+def place_special_cells(rng, rows, cols, agents):
+    """
+    Pick distinct cells for S, G and every S<n>/G<n> pair.
+    """
+    labels = ["S", "G"]
+    for n in range(1, agents + 1):
+        labels += [f"S{n}", f"G{n}"]
+    if len(labels) > rows * cols:
+        raise ValueError("Map is too small for the requested number of agents")
+
+    cells = rng.sample(range(rows * cols), len(labels))
+    return {label: divmod(cell, cols) for label, cell in zip(labels, cells)}
+
+
+def carve_corridor(rng, map, source, target):
+    """
+    Clear obstacles along a random monotone path from source to target.
+    """
+    i, j = source
+    while (i, j) != target:
+        move_row = j == target[1] or (i != target[0] and rng.random() < 0.5)
+        if move_row:
+            i += 1 if target[0] > i else -1
+        else:
+            j += 1 if target[1] > j else -1
+        if map[i][j] == "-1":
+            map[i][j] = "0"
+
+
+def reachable_from(grid, start):
+    seen = bytearray(grid.size)
+    start_index = grid.index(start)
+    seen[start_index] = 1
+    stack = [start_index]
+    while stack:
+        current = stack.pop()
+        for next_pos in grid.neighbors[current]:
+            if not seen[next_pos]:
+                seen[next_pos] = 1
+                stack.append(next_pos)
+    return seen
+
+
+def min_time_route(grid, start, goal):
+    """
+    Return (time, steps) of the minimum-time route from start to goal, or None.
+    """
+    start_index, goal_index = grid.index(start), grid.index(goal)
+    best = {start_index: (0, 0)}
+    pq = [(0, 0, start_index)]
+    while pq:
+        time_used, steps, current = heapq.heappop(pq)
+        if current == goal_index:
+            return time_used, steps
+        if best[current] < (time_used, steps):
+            continue
+        for next_pos in grid.neighbors[current]:
+            candidate = (time_used + grid.time_cost[next_pos], steps + 1)
+            if next_pos not in best or candidate < best[next_pos]:
+                best[next_pos] = candidate
+                heapq.heappush(pq, (candidate[0], candidate[1], next_pos))
+    return None
+
+
+def generate_map(
+    rows,
+    cols,
+    seed=0,
+    obstacle_density=0.2,
+    time_cell_density=0.05,
+    max_time_cost=5,
+    fuel_stations=3,
+    agents=0,
+    time_limit=None,
+    fuel_limit=None,
+    slack=1.5,
+):
+    """
+    Generate a map and return (time_limit, fuel_limit, map) with map as rows of cell strings.
+    """
+    rng = random.Random(seed)
+    special = place_special_cells(rng, rows, cols, agents)
+    special_cells = set(special.values())
+
+    map = []
+    for i in range(rows):
+        row = []
+        for j in range(cols):
+            roll = rng.random()
+            if (i, j) in special_cells:
+                cell = "0"
+            elif roll < obstacle_density:
+                cell = "-1"
+            elif roll < obstacle_density + time_cell_density:
+                cell = str(rng.randint(1, max_time_cost))
+            else:
+                cell = "0"
+            row.append(cell)
+        map.append(row)
+
+    # Fuel stations go on free cells only, so they never block a corridor
+    free_cells = [
+        (i, j)
+        for i in range(rows)
+        for j in range(cols)
+        if map[i][j] == "0" and (i, j) not in special_cells
+    ]
+    for i, j in rng.sample(free_cells, min(fuel_stations, len(free_cells))):
+        map[i][j] = f"F{rng.randint(1, max_time_cost)}"
+
+    for label, (i, j) in special.items():
+        map[i][j] = label
+
+    # Connect every special cell to the main start
+    grid = Grid(map, rows, cols)
+    reachable = reachable_from(grid, special["S"])
+    carved = False
+    for label, pos in special.items():
+        if not reachable[grid.index(pos)]:
+            carve_corridor(rng, map, pos, special["S"])
+            carved = True
+    if carved:
+        grid = Grid(map, rows, cols)
+
+    # Every agent gets the same limits, so they have to fit the hardest delivery
+    routes = {"S": min_time_route(grid, special["S"], special["G"])}
+    for n in range(1, agents + 1):
+        routes[f"S{n}"] = min_time_route(grid, special[f"S{n}"], special[f"G{n}"])
+    route_time = max(time for time, _ in routes.values())
+    route_steps = max(steps for _, steps in routes.values())
+    if time_limit is None:
+        time_limit = math.ceil(route_time * slack)
+    if fuel_limit is None:
+        fuel_limit = route_steps
+    for start, (time, steps) in routes.items():
+        if time_limit < time:
+            print(
+                f"Warning: time limit {time_limit} is below the fastest route "
+                f"of {start} ({time})",
+                file=sys.stderr,
+            )
+        if fuel_limit < steps:
+            print(
+                f"Warning: fuel limit {fuel_limit} may need refueling "
+                f"(fastest route of {start} has {steps} steps)",
+                file=sys.stderr,
+            )
+
+    return time_limit, fuel_limit, map
+
+
+def write_map(file, rows, cols, time_limit, fuel_limit, map):
+    file.write(f"{rows} {cols} {time_limit} {fuel_limit}\n")
+    for row in map:
+        file.write(" ".join(row) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic map.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("cols", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--obstacle-density", type=float, default=0.2)
+    parser.add_argument(
+        "--time-cell-density",
+        type=float,
+        default=0.05,
+        help="share of cells with an extra time cost",
+    )
+    parser.add_argument("--max-time-cost", type=int, default=5)
+    parser.add_argument("--fuel-stations", type=int, default=3)
+    parser.add_argument(
+        "--agents", type=int, default=0, help="number of S<n>/G<n> pairs"
+    )
+    parser.add_argument("--time-limit", type=int)
+    parser.add_argument("--fuel-limit", type=int)
+    parser.add_argument("--output", help="map file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    time_limit, fuel_limit, map = generate_map(
+        args.rows,
+        args.cols,
+        seed=args.seed,
+        obstacle_density=args.obstacle_density,
+        time_cell_density=args.time_cell_density,
+        max_time_cost=args.max_time_cost,
+        fuel_stations=args.fuel_stations,
+        agents=args.agents,
+        time_limit=args.time_limit,
+        fuel_limit=args.fuel_limit,
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            write_map(file, args.rows, args.cols, time_limit, fuel_limit, map)
+    else:
+        write_map(sys.stdout, args.rows, args.cols, time_limit, fuel_limit, map)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,7 +61,7 @@ def main_menu(screen, clock, big_font, medium_font):
         settings_button.draw(screen)
 
         pygame.display.flip()
-        clock.tick(60)
+        clock.tick(FPS)
 
 
 def settings_menu(screen, clock, medium_font, game_parameter):
@@ -119,11 +119,7 @@ def settings_menu(screen, clock, medium_font, game_parameter):
                 if map_button.is_clicked(event.pos):
                     game_parameter.map_type = (game_parameter.map_type % 5) + 1
                 if algo_button.is_clicked(event.pos):
-                    algorithms = (
-                        ["BFS", "DFS", "UCS", "GBFS", "A*"]
-                        if game_parameter.level == 1
-                        else (["UCS", "A*"] if game_parameter.level == 2 else ["A*"])
-                    )
+                    algorithms = LEVEL_ALGORITHMS[game_parameter.level]
                     current_index = algorithms.index(game_parameter.algorithm)
                     game_parameter.algorithm = algorithms[
                         (current_index + 1) % len(algorithms)
@@ -151,6 +147,9 @@ def settings_menu(screen, clock, medium_font, game_parameter):
             pygame.display.set_caption(
                 "Warning: Level 3 cannot handle by BFS, DFS, UCS or GBFS algorithm. Auto changing to the suitable algorithm."
             )
+        elif game_parameter.algorithm not in LEVEL_ALGORITHMS[game_parameter.level]:
+            # Algorithms made for one level only fall back to A*
+            game_parameter.algorithm = "A*"
 
         level_button.text = f"Level: {game_parameter.level}"
         map_button.text = f"Map: {game_parameter.map_type}"
@@ -164,4 +163,4 @@ def settings_menu(screen, clock, medium_font, game_parameter):
         back_button.draw(screen)
 
         pygame.display.flip()
-        clock.tick(60)
+        clock.tick(FPS)
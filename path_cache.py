@@ -0,0 +1,63 @@
+import shelve
+from collections import OrderedDict
+
+
+class PathCache:
+    """
+    LRU cache of find_and_draw_path results, keyed by a digest of the map content
+    and the query (algorithm, level, start, goal, time_limit, fuel_limit).
+
+    With a file name, every result is also written to a shelve store so it
+    survives restarts; the in-memory LRU then acts as its front.
+    """
+
+    def __init__(self, maxsize=256, filename=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.store = shelve.open(filename) if filename else None
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, grid, algorithm, level, start, goal, time_limit, fuel_limit):
+        return (
+            grid.content_key(),
+            algorithm,
+            level,
+            start,
+            goal,
+            time_limit,
+            fuel_limit,
+        )
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        if self.store is not None:
+            result = self.store.get(repr(key))
+            if result is not None:
+                self.remember(key, result)
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        self.remember(key, result)
+        if self.store is not None:
+            self.store[repr(key)] = result
+
+    def remember(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,183 @@
+"""
+Headless batch planner.
+
+Runs the Controller searches on map files without opening a pygame window and
+writes one JSON object per query to stdout (or --output):
+
+    python planner.py assets/maps/map1.txt assets/maps/map5.txt --levels 1 2 --repeat 10
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import random
+import sys
+import time
+
+from config import LEVEL_ALGORITHMS
+from conflicts import ConflictIndex
+from controller import Controller
+from headless import HeadlessParameter, HeadlessRender
+from path_cache import PathCache
+from portfolio import Portfolio
+
+
+def create_controller(map_path, level, algorithm):
+    game_parameter = HeadlessParameter(map_path, level, algorithm)
+    return Controller(HeadlessRender(game_parameter))
+
+
+def finite_or_none(value):
+    # JSON has no infinity; unlimited time/fuel is written as null
+    return None if value is None or math.isinf(value) else value
+
+
+def run_query(map_path, level, algorithm, seed=0, path_cache=None, portfolio=None):
+    """
+    Plan one (map, level, algorithm) query and return it as a JSON-ready dict.
+    Levels 1-3 go through path_cache when one is given, and "Race" runs on
+    portfolio when one is given.
+    """
+    controller = create_controller(map_path, level, algorithm)
+    controller.path_cache = path_cache
+    if portfolio is not None:
+        controller.portfolio = portfolio
+    controller.portfolio.last_winner = None
+    game_parameter = controller.render.game_parameter
+    random.seed(seed)  # Level 4 draws random goals
+
+    record = {"map": map_path, "level": level, "algorithm": algorithm}
+    if level == 4:
+        start_time = time.perf_counter()
+        path, goal = controller.plan_paths_multi()
+        elapsed = time.perf_counter() - start_time
+
+        main_agent = game_parameter.main_agent
+        record["found"] = bool(path)
+        record["path"] = path or []
+        record["time_left"] = finite_or_none(getattr(main_agent, "time_left", None))
+        record["fuel_left"] = finite_or_none(getattr(main_agent, "fuel_left", None))
+        record["agents"] = {
+            agent.id: {"goal": agent.goal, "path": agent.path}
+            for agent in game_parameter.agents
+        }
+        # Solution quality, to compare the prioritized and CBS planners
+        conflict_index = ConflictIndex()
+        for agent in game_parameter.agents:
+            conflict_index.update(agent.id, agent.path)
+        record["cost"] = sum(
+            len(agent.path) - 1 for agent in game_parameter.agents if agent.path
+        )
+        record["planned"] = sum(1 for agent in game_parameter.agents if agent.path)
+        record["arrived"] = sum(
+            1
+            for agent in game_parameter.agents
+            if agent.path and agent.path[-1] == agent.goal
+        )
+        record["conflicts"] = (
+            sum(len(others) for others in conflict_index.conflicts.values()) // 2
+        )
+    else:
+        start_time = time.perf_counter()
+        path, time_left, fuel_left = controller.find_and_draw_path(
+            algorithm, level, game_parameter.time_limit, game_parameter.fuel_limit
+        )
+        elapsed = time.perf_counter() - start_time
+
+        record["found"] = bool(path)
+        record["path"] = path
+        record["time_left"] = finite_or_none(time_left)
+        record["fuel_left"] = finite_or_none(fuel_left)
+        if algorithm == "Race":
+            # None when the result came from the cache or nothing was found
+            record["winner"] = controller.portfolio.last_winner
+
+    record["seconds"] = elapsed
+    return record
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Plan routes on map files without a display."
+    )
+    parser.add_argument("maps", nargs="+", help="map files in the assets/maps format")
+    parser.add_argument(
+        "--levels", type=int, nargs="+", default=[1, 2, 3, 4], choices=[1, 2, 3, 4]
+    )
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        default=None,
+        help="algorithms to run (default: every algorithm the level supports)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="run every query this many times"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed for level 4 goals")
+    parser.add_argument(
+        "--cache", action="store_true", help="reuse results of repeated queries"
+    )
+    parser.add_argument(
+        "--cache-file", help="keep cached results in this file between runs"
+    )
+    parser.add_argument(
+        "--race-budget",
+        type=float,
+        default=None,
+        help="seconds Race waits for a shorter path (default: first path wins)",
+    )
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = open(args.output, "w") if args.output else sys.stdout
+    path_cache = None
+    if args.cache or args.cache_file:
+        path_cache = PathCache(filename=args.cache_file)
+    portfolio = Portfolio(budget=args.race_budget)  # Shared, to count wins
+
+    queries = 0
+    planning_time = 0.0
+    start_time = time.perf_counter()
+    try:
+        for map_path in args.maps:
+            for level in args.levels:
+                for algorithm in LEVEL_ALGORITHMS[level]:
+                    if args.algorithms and algorithm not in args.algorithms:
+                        continue
+                    for _ in range(args.repeat):
+                        # Controller reports failures with print; keep stdout pure JSON
+                        with contextlib.redirect_stdout(sys.stderr):
+                            record = run_query(
+                                map_path,
+                                level,
+                                algorithm,
+                                args.seed,
+                                path_cache,
+                                portfolio,
+                            )
+                        output.write(json.dumps(record) + "\n")
+                        queries += 1
+                        planning_time += record["seconds"]
+    finally:
+        if args.output:
+            output.close()
+        if path_cache is not None:
+            path_cache.close()
+
+    total_time = time.perf_counter() - start_time
+    print(
+        f"{queries} queries in {total_time:.3f}s "
+        f"(planning {planning_time:.3f}s, "
+        f"{queries / planning_time if planning_time else 0:.1f} queries/s)",
+        file=sys.stderr,
+    )
+    for line in portfolio.report():
+        print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import multiprocessing
+import queue
+import time
+from collections import Counter
+
+from headless import HeadlessRender
+
+# Searches raced at each level, those that find shortest paths
+DEFAULT_ALGORITHMS = {
+    1: ["A*", "JPS", "Bi-A*", "Bi-BFS", "UCS"],
+    2: ["UCS", "A*"],
+    3: ["A*", "A* (F)"],
+}
+
+
+class SolverParameter:
+    """
+    The part of a GameParameter the level 1-3 searches read, without the fonts,
+    so it can be handed to a solver process.
+    """
+
+    def __init__(self, game_parameter):
+        self.level = game_parameter.level
+        self.rows = game_parameter.rows
+        self.cols = game_parameter.cols
+        self.time_limit = game_parameter.time_limit
+        self.fuel_limit = game_parameter.fuel_limit
+        self.map = game_parameter.map
+        self.grid = game_parameter.grid
+        self.agents = []
+        self.main_agent = None
+
+
+def solve(parameter, algorithm, time_limit, fuel_limit, results):
+    """
+    Run one search of the race in its own process and put (algorithm,
+    (path, time_left, fuel_left), expanded, pushed) on the results queue.
+    A search that fails outright reports an empty path.
+    """
+    # Imported here, controller imports this module
+    from controller import Controller
+
+    controller = Controller(HeadlessRender(parameter))
+    result = ([], time_limit, fuel_limit)  # Reported if the search fails
+    try:
+        result = controller.find_path(algorithm, time_limit, fuel_limit)
+    finally:
+        results.put(
+            (algorithm, result, controller.stats.expanded, controller.stats.pushed)
+        )
+
+
+class Portfolio:
+    """
+    Races several searches for the same query, each in its own process.
+
+    Without a budget the first search to find a path wins. With a budget in
+    seconds the shortest path found before it runs out wins (most time and fuel
+    left on ties), or the first one found after it if none was found before.
+    The searches still running then are terminated. Wins are counted per level
+    and algorithm, to tell which search suits which maps.
+    """
+
+    def __init__(self, algorithms=DEFAULT_ALGORITHMS, budget=None):
+        self.algorithms = algorithms  # level -> algorithms raced at that level
+        self.budget = budget
+        self.wins = Counter()  # (level, algorithm) -> races won
+        self.races = Counter()  # level -> races run
+        self.last_winner = None
+
+    def race(self, game_parameter, time_limit, fuel_limit):
+        """
+        Return (winner, (path, time_left, fuel_left), expanded, pushed) for the
+        level of game_parameter, with winner None if no search found a path.
+        """
+        level = game_parameter.level
+        parameter = SolverParameter(game_parameter)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=solve,
+                args=(parameter, algorithm, time_limit, fuel_limit, results),
+                daemon=True,
+            )
+            for algorithm in self.algorithms[level]
+        ]
+        for process in processes:
+            process.start()
+
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        best = None
+        expanded = pushed = 0
+        try:
+            for _ in processes:
+                timeout = None
+                if deadline is not None and best is not None:
+                    timeout = max(deadline - time.perf_counter(), 0)
+                try:
+                    algorithm, result, solver_expanded, solver_pushed = results.get(
+                        timeout=timeout
+                    )
+                except queue.Empty:
+                    break  # Out of budget, keep the best so far
+                expanded += solver_expanded
+                pushed += solver_pushed
+                if not result[0]:
+                    continue
+                path, time_left, fuel_left = result
+                rank = (len(path), -time_left, -fuel_left)
+                if best is None or rank < best[0]:
+                    best = (rank, algorithm, result)
+                if deadline is None:
+                    break  # First path wins
+        finally:
+            # The losers are not needed any more
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            results.close()
+
+        self.races[level] += 1
+        if best is None:
+            self.last_winner = None
+            return None, ([], time_limit, fuel_limit), expanded, pushed
+        _, winner, result = best
+        self.wins[(level, winner)] += 1
+        self.last_winner = winner
+        return winner, result, expanded, pushed
+
+    def report(self):
+        """
+        Return one line per level raced, with every algorithm's share of wins.
+        """
+        lines = []
+        for level in sorted(self.races):
+            shares = ", ".join(
+                f"{algorithm} {self.wins[(level, algorithm)]}"
+                for algorithm in self.algorithms[level]
+            )
+            lines.append(f"Level {level}: {self.races[level]} races, wins: {shares}")
+        return lines
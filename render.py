@@ -1,6 +1,12 @@
 from config import *
+from grid import Grid, Agent, read_map
 import pygame
 
+try:
+    import numpy
+except ImportError:  # Only the "array" render mode needs NumPy
+    numpy = None
+
 
 class GameParameter:
     def __init__(self):
@@ -8,6 +14,7 @@ class GameParameter:
         self.map_type = 1
 
         self.map = []
+        self.grid = None  # Compiled form of map, rebuilt by set_map
         self.rows = 0
         self.cols = 0
         self.time_limit = 0
@@ -57,96 +64,31 @@ class GameParameter:
         """
         map_path = f"assets/maps/map{self.map_type}.txt"
 
-        with open(map_path, "r") as file:
-            lines = file.readlines()
-
-            # First line contains rows, columns, time limit, and fuel limit
-            first_line = lines[0].strip().split()
-            self.rows = int(first_line[0])
-            self.cols = int(first_line[1])
-            self.time_limit = int(first_line[2])
-            self.fuel_limit = int(first_line[3])
-
-            # Initialize the map
-            self.map = []
-            self.agents = []
-
-            agent_goals = {}  # use for level 4
-
-            # Read the map
-            for i, line in enumerate(lines[1:]):
-                row = line.strip().split()
-
-                if self.level == 1:
-                    row = [
-                        "0" if cell not in ["0", "-1", "S", "G"] else cell
-                        for cell in row
-                    ]
-                elif self.level == 2:
-                    row = [
-                        (
-                            "0"
-                            if not (cell.isdigit() or cell in ["0", "-1", "S", "G"])
-                            else cell
-                        )
-                        for cell in row
-                    ]
-                elif self.level == 3:
-                    row = [
-                        (
-                            "0"
-                            if (cell.startswith("S") and cell[1:].isdigit())
-                            or (cell.startswith("G") and cell[1:].isdigit())
-                            else cell
-                        )
-                        for cell in row
-                    ]
-                elif self.level == 4:
-                    for j, cell in enumerate(row):
-                        if cell.startswith("S") and cell != "S":
-                            self.agents.append(Agent(f"S{cell[1:]}", (i, j), None))
-                        elif cell == "S":
-                            self.main_agent = Agent("S", (i, j), None)
-                            self.agents.append(self.main_agent)
-                        elif cell.startswith("G"):
-                            agent_goals[cell if cell != "G" else "G"] = (i, j)
-
-                self.map.append(row)
-
-            # Update agent goals for level 4
-            if self.level == 4:
-                for agent in self.agents:
-                    if agent.id in agent_goals:
-                        agent.update_goal(agent_goals[agent.id])
-                    elif agent.id.startswith("S") and "G" + agent.id[1:] in agent_goals:
-                        agent.update_goal(agent_goals["G" + agent.id[1:]])
-
-            # Set colors for agents (surely unique)
-            for agent in self.agents:
+        (
+            self.rows,
+            self.cols,
+            self.time_limit,
+            self.fuel_limit,
+            self.map,
+            self.agents,
+            main_agent,
+        ) = read_map(map_path, self.level)
+        if main_agent is not None:
+            self.main_agent = main_agent
+        self.grid = Grid(self.map, self.rows, self.cols)
+
+        # Set colors for agents (surely unique)
+        for agent in self.agents:
+            color = generate_color()
+            while color in self.agent_color.values():
                 color = generate_color()
-                while color in self.agent_color.values():
-                    color = generate_color()
-                self.agent_color[agent.id] = color
+            self.agent_color[agent.id] = color
 
         # Ensure main_agent is set for all levels
         if self.main_agent is None:
             self.main_agent = Agent("S", None, None)
 
 
-class Agent:
-    def __init__(self, id, start, goal):
-        self.id = id
-        self.position = start
-        self.start = start
-        self.goal = goal
-        self.path = []
-        self.path_all = []
-        self.completed = False
-
-    def update_goal(self, goal):
-        self.goal = goal
-
-
 class Render:
     def __init__(self, game_parameter):
         self.game_parameter = game_parameter
@@ -154,12 +96,27 @@ class Render:
         self.screen = None
         self.clock = None
         self.grid = None
-        self.cell_size = 0
+        self.cell_size = 0  # Pixels per cell, the zoom
+        self.view_i = 0  # Top-left cell in view
+        self.view_j = 0
         self.running = True
         self.agent_paths = {agent.id: [] for agent in game_parameter.agents}
         self.path_indices = {agent.id: 0 for agent in game_parameter.agents}
         self.path_progress = {agent.id: 0 for agent in game_parameter.agents}
 
+        # Layers composited into self.grid, see draw_grid
+        self.static_layer = None  # Cells, labels and grid lines
+        self.path_layer = None  # Path trails, transparent elsewhere
+        self.trails = {}  # agent id -> (path, segments drawn on path_layer)
+        self.glyphs = {}  # (text, size) -> rendered cell label
+        self.array_mode = False  # Cells painted from cell_colors, see RENDER_MODE
+        self.cell_colors = None  # rows x cols indices into palette
+        self.palette = []  # RGB colors of the array mode
+        self.palette_index = {}  # Cell string -> index into palette
+        self.fonts = {}  # size -> font of the cell labels
+        self.dirty = []  # Rects of self.grid changed since the last draw
+        self.repaint = True  # The next draw repaints the whole window
+
     def initialize(self):
         """
         Initialize the game window.
@@ -168,91 +125,306 @@ class Render:
         self.screen = pygame.display.set_mode((SCREEN_SIZE + 300, SCREEN_SIZE))
         self.clock = pygame.time.Clock()
         self.grid = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
-        self.cell_size = SCREEN_SIZE // self.game_parameter.cols
+        # Fit the whole map in the window, down to one pixel per cell
+        self.cell_size = max(
+            SCREEN_SIZE // max(self.game_parameter.rows, self.game_parameter.cols), 1
+        )
+        self.view_i = self.view_j = 0
 
-    def draw_grid(self):
+        self.static_layer = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE))
+        self.path_layer = pygame.Surface((SCREEN_SIZE, SCREEN_SIZE), pygame.SRCALPHA)
+        self.game_parameter.grid.changed = []  # Cells to repaint, see draw_grid
+        self.reset_view()
+        self.repaint = True
+
+    def view_size(self):
         """
-        Draw the grid lines on the game window.
-        """
-        self.grid.fill(BACKGROUND_COLOR)
-        for i in range(self.game_parameter.rows):
-            for j in range(self.game_parameter.cols):
-                cell = self.game_parameter.map[i][j]
-                color = BACKGROUND_COLOR
-                if cell == "S":
-                    color = START_COLOR
-                elif cell.startswith("S"):
-                    # print("agent id: ", )
-                    color = self.game_parameter.agent_color.get(cell, START_COLOR)
-                elif cell.startswith("G"):
-                    color = GOAL_COLOR
-                elif cell.startswith("F"):
-                    color = FUEL_COLOR
-                elif cell.isdigit() and cell != "-1" and cell != "0":
-                    color = TIME_COLOR
-                elif cell == "-1":
-                    color = OBSTACLE_COLOR
-
-                pygame.draw.rect(
-                    self.grid,
-                    color,
-                    (
-                        j * self.cell_size,
-                        i * self.cell_size,
-                        self.cell_size,
-                        self.cell_size,
-                    ),
-                )
+        Return the number of rows and columns of cells that fit in the window.
+        """
+        cells = -(-SCREEN_SIZE // self.cell_size)  # Partly visible ones too
+        return (
+            min(cells, self.game_parameter.rows - self.view_i),
+            min(cells, self.game_parameter.cols - self.view_j),
+        )
+
+    def reset_view(self):
+        """
+        Redraw both layers for the current view: the top-left cell (view_i,
+        view_j) and the zoom (cell_size pixels per cell).
+        """
+        self.array_mode = numpy is not None and (
+            RENDER_MODE == "array"
+            or RENDER_MODE == "auto" and self.cell_size < ARRAY_RENDER_CELL_SIZE
+        )
+        self.draw_static_layer()
+        self.path_layer.fill((0, 0, 0, 0))
+        self.trails = {}
+        self.dirty = [self.grid.get_rect()]
+
+    def clamp_view(self, view_i, view_j):
+        """
+        Return the top-left cell closest to (view_i, view_j) that keeps the
+        window on the map.
+        """
+        shown = SCREEN_SIZE // self.cell_size  # Whole cells in the window
+        return (
+            max(min(view_i, self.game_parameter.rows - shown), 0),
+            max(min(view_j, self.game_parameter.cols - shown), 0),
+        )
+
+    def move_view(self, di, dj):
+        """
+        Scroll the view by di rows and dj columns.
+        """
+        view = self.clamp_view(self.view_i + di, self.view_j + dj)
+        if view != (self.view_i, self.view_j):
+            self.view_i, self.view_j = view
+            self.reset_view()
+
+    def zoom(self, steps, focus=None):
+        """
+        Double the cell size once per step (halve it for negative steps),
+        keeping the cell under the focus pixel in place (the window center by
+        default).
+        """
+        cell_size = self.cell_size
+        if steps > 0:
+            cell_size = min(cell_size << steps, MAX_CELL_SIZE)
+        else:
+            cell_size = max(cell_size >> -steps, 1)
+        if cell_size == self.cell_size:
+            return
+        x, y = focus or (SCREEN_SIZE // 2, SCREEN_SIZE // 2)
+        focus_i = self.view_i + y / self.cell_size
+        focus_j = self.view_j + x / self.cell_size
+        self.cell_size = cell_size
+        self.view_i, self.view_j = self.clamp_view(
+            int(focus_i - y / cell_size), int(focus_j - x / cell_size)
+        )
+        self.reset_view()
+
+    def cell_color(self, cell):
+        """
+        Return the fill color of a map cell.
+        """
+        if cell == "S":
+            return START_COLOR
+        elif cell.startswith("S"):
+            return self.game_parameter.agent_color.get(cell, START_COLOR)
+        elif cell.startswith("G"):
+            return GOAL_COLOR
+        elif cell.startswith("F"):
+            return FUEL_COLOR
+        elif cell.isdigit() and cell != "-1" and cell != "0":
+            return TIME_COLOR
+        elif cell == "-1":
+            return OBSTACLE_COLOR
+        return BACKGROUND_COLOR
+
+    def glyph(self, text, size):
+        """
+        Return the rendered label text at a font size, rendering it only once.
+        """
+        surface = self.glyphs.get((text, size))
+        if surface is None:
+            font = self.fonts.get(size)
+            if font is None:
+                font = self.fonts[size] = pygame.font.Font(None, size)
+            surface = font.render(text, True, GRID_LINE_COLOR)
+            self.glyphs[(text, size)] = surface
+        return surface
+
+    def draw_cell(self, i, j):
+        """
+        Paint one cell of the static layer: its color, its label and the grid
+        lines along its top and left edges, as far as the zoom shows them.
+        Return the rect painted, or None if the cell is out of view.
+        """
+        cell = self.game_parameter.map[i][j]
+        if self.cell_colors is not None:
+            self.cell_colors[i, j] = self.color_index(cell)
+        rows, cols = self.view_size()
+        if not (
+            self.view_i <= i < self.view_i + rows
+            and self.view_j <= j < self.view_j + cols
+        ):
+            return None
+
+        x = (j - self.view_j) * self.cell_size
+        y = (i - self.view_i) * self.cell_size
+        rect = pygame.Rect(x, y, self.cell_size, self.cell_size)
+        if self.array_mode:
+            self.static_layer.fill(self.cell_color(cell), rect)
+            return rect
+        pygame.draw.rect(self.static_layer, self.cell_color(cell), rect)
+
+        # Draw the cell content
+        if cell != "0" and cell != "-1" and self.cell_size >= LABEL_MIN_CELL_SIZE:
+            text_surface = self.glyph(cell, int(self.cell_size * 0.5))
+            text_rect = text_surface.get_rect(center=rect.center)
+            self.static_layer.blit(text_surface, text_rect)
+
+        if self.cell_size >= GRID_LINE_MIN_CELL_SIZE:
+            pygame.draw.line(
+                self.static_layer, GRID_LINE_COLOR, (x, y), (x + self.cell_size, y)
+            )
+            pygame.draw.line(
+                self.static_layer, GRID_LINE_COLOR, (x, y), (x, y + self.cell_size)
+            )
+        return rect
+
+    def color_index(self, cell):
+        """
+        Return the palette index of the fill color of a map cell.
+        """
+        index = self.palette_index.get(cell)
+        if index is None:
+            color = tuple(pygame.Color(self.cell_color(cell)))[:3]
+            if color not in self.palette:
+                self.palette.append(color)
+            index = self.palette_index[cell] = self.palette.index(color)
+        return index
+
+    def draw_static_array(self):
+        """
+        Paint the cells in view onto the static layer from cell_colors: the
+        colors are looked up for every cell at once, and the image is scaled
+        to cell_size pixels per cell (nearest neighbor) in one blit. There are
+        no labels or grid lines at this size.
+        """
+        if self.cell_colors is None:
+            # Every distinct cell string gets its index once
+            for cell in set().union(*map(set, self.game_parameter.map)):
+                self.color_index(cell)
+            lookup = self.palette_index.__getitem__
+            self.cell_colors = numpy.array(
+                [list(map(lookup, row)) for row in self.game_parameter.map],
+                dtype=numpy.uint16,
+            )
+        rows, cols = self.view_size()
+        cells = self.cell_colors[
+            self.view_i : self.view_i + rows, self.view_j : self.view_j + cols
+        ]
+        pixels = numpy.array(self.palette, dtype=numpy.uint8)[cells]
+        # surfarray indexes pixels by (x, y)
+        image = pygame.surfarray.make_surface(pixels.transpose(1, 0, 2))
+        self.static_layer.fill(BACKGROUND_COLOR)
+        self.static_layer.blit(
+            pygame.transform.scale(
+                image, (cols * self.cell_size, rows * self.cell_size)
+            ),
+            (0, 0),
+        )
 
-                # Draw the cell content
-                if cell != "0" and cell != "-1":
-                    cell_font = pygame.font.Font(None, int(self.cell_size * 0.5))
-                    text_surface = cell_font.render(cell, True, GRID_LINE_COLOR)
-                    text_rect = text_surface.get_rect(
-                        center=(
-                            j * self.cell_size + self.cell_size // 2,
-                            i * self.cell_size + self.cell_size // 2,
-                        )
-                    )
-                    self.grid.blit(text_surface, text_rect)
+    def draw_static_layer(self):
+        """
+        Paint the cells in view onto the static layer.
+        """
+        if self.array_mode:
+            self.draw_static_array()
+            return
+
+        self.static_layer.fill(BACKGROUND_COLOR)
+        rows, cols = self.view_size()
+        for i in range(self.view_i, self.view_i + rows):
+            for j in range(self.view_j, self.view_j + cols):
+                self.draw_cell(i, j)
 
         # Draw grid lines
-        for i in range(self.game_parameter.rows + 1):
+        if self.cell_size < GRID_LINE_MIN_CELL_SIZE:
+            return
+        for i in range(rows + 1):
             pygame.draw.line(
-                self.grid,
+                self.static_layer,
                 GRID_LINE_COLOR,
                 (0, i * self.cell_size),
                 (SCREEN_SIZE, i * self.cell_size),
             )
-        for j in range(self.game_parameter.cols + 1):
+        for j in range(cols + 1):
             pygame.draw.line(
-                self.grid,
+                self.static_layer,
                 GRID_LINE_COLOR,
                 (j * self.cell_size, 0),
                 (j * self.cell_size, SCREEN_SIZE),
             )
 
+    def trail_length(self, agent_id):
+        # Segments of the agent's path walked so far
+        if not self.agent_paths[agent_id]:
+            return 0
+        return min(self.path_indices[agent_id] + 1, self.path_progress[agent_id])
+
+    def draw_trails(self):
+        """
+        Add the path segments walked since the last call to the path layer,
+        skipping those out of view. A path that was replaced or shortened
+        clears the layer, and every trail is drawn again from the start.
+        """
+        for agent_id, (path, segments) in self.trails.items():
+            if (
+                self.agent_paths[agent_id] is not path
+                or self.trail_length(agent_id) < segments
+            ):
+                self.path_layer.fill((0, 0, 0, 0))
+                self.trails = {}
+                self.dirty.append(self.path_layer.get_rect())
+                break
+
+        rows, cols = self.view_size()
+        first_i, last_i = self.view_i - 1, self.view_i + rows
+        first_j, last_j = self.view_j - 1, self.view_j + cols
+        # Path pixels of cell (i, j) are its center in the view
+        offset_x = self.cell_size // 2 - self.view_j * self.cell_size
+        offset_y = self.cell_size // 2 - self.view_i * self.cell_size
+
         # Draw path as line
         for agent_id, path in reversed(self.agent_paths.items()):
             id_value = (int(agent_id[1:]) * 3) if agent_id != "S" else 0
             if id_value > 15:
-                id_value = ((int(agent_id[1:])-5) * (-3))
-            if path:
-                color = self.game_parameter.agent_color.get(agent_id, START_COLOR)
-                progress = self.path_progress[agent_id]
-                current_index = self.path_indices[agent_id]
-                for i in range(min(current_index + 1, progress)):
-                    start = path[i]
-                    end = path[i + 1]
-                    start_pixel = (
-                        id_value + (start[1] * self.cell_size + self.cell_size // 2),
-                        id_value + (start[0] * self.cell_size + self.cell_size // 2),
-                    )
-                    end_pixel = (
-                        id_value + (end[1] * self.cell_size + self.cell_size // 2),
-                        id_value + (end[0] * self.cell_size + self.cell_size // 2),
-                    )
-                    pygame.draw.line(self.grid, color, start_pixel, end_pixel, 3)
+                id_value = (int(agent_id[1:]) - 5) * (-3)
+            if self.array_mode or self.cell_size < LABEL_MIN_CELL_SIZE:
+                id_value = 0  # Cells are too small to set the trails apart
+            color = self.game_parameter.agent_color.get(agent_id, START_COLOR)
+            drawn = self.trails.get(agent_id, (path, 0))[1]
+            length = self.trail_length(agent_id)
+            for i in range(drawn, length):
+                start = path[i]
+                end = path[i + 1]
+                if not (
+                    first_i <= start[0] <= last_i and first_j <= start[1] <= last_j
+                ):
+                    continue  # Out of view, the end is a neighbor of the start
+                start_pixel = (
+                    id_value + offset_x + start[1] * self.cell_size,
+                    id_value + offset_y + start[0] * self.cell_size,
+                )
+                end_pixel = (
+                    id_value + offset_x + end[1] * self.cell_size,
+                    id_value + offset_y + end[0] * self.cell_size,
+                )
+                self.dirty.append(
+                    pygame.draw.line(self.path_layer, color, start_pixel, end_pixel, 3)
+                )
+            self.trails[agent_id] = (path, length)
+
+    def draw_grid(self):
+        """
+        Bring the map surface up to date. The static layer is only repainted
+        where set_cell wrote a cell in view, the path layer only gets the new
+        trail segments, and the two are composited into self.grid where they
+        changed.
+        """
+        changed = self.game_parameter.grid.changed
+        for i, j in changed:
+            rect = self.draw_cell(i, j)
+            if rect is not None:
+                self.dirty.append(rect)
+        changed.clear()
+        self.draw_trails()
+
+        for rect in self.dirty:
+            self.grid.blit(self.static_layer, rect, rect)
+            self.grid.blit(self.path_layer, rect, rect)
 
     def draw_text(self, text, font, color, x, y):
         """
@@ -368,8 +540,19 @@ class Render:
         self.path_progress[agent_id] = 0
 
     def draw(self):
-        self.screen.fill(BACKGROUND_COLOR)
+        """
+        Bring the game window up to date. After the first frame only the areas
+        of the map that changed are copied and updated on the display.
+        """
         self.draw_grid()
-        self.screen.blit(self.grid, (0, 0))
-        self.draw_info_board()
-        pygame.display.flip()
\ No newline at end of file
+        if self.repaint:
+            self.screen.fill(BACKGROUND_COLOR)
+            self.screen.blit(self.grid, (0, 0))
+            self.draw_info_board()
+            pygame.display.flip()
+            self.repaint = False
+        else:
+            for rect in self.dirty:
+                self.screen.blit(self.grid, rect, rect)
+            pygame.display.update(self.dirty)
+        self.dirty = []
\ No newline at end of file
@@ -0,0 +1,88 @@
+import math
+from collections import defaultdict
+
+
+class ReservationTable:
+    """
+    Level-4 reservations keyed by (cell, timestep).
+
+    Every path reserves each step from its first one on, so timesteps are dense:
+    the table is a list of layers indexed by timestep, each mapping a flat cell
+    index to a bit mask of the agent slots holding it. Reserve, assign and
+    lookup are O(1), and the table is updated as paths are assigned instead of
+    being rebuilt from every agent's history. The steps each cell is held at are
+    indexed too, so the safe intervals of a cell come without scanning layers.
+
+    When several agents hold a cell at the same step, the one listed last in
+    agent_ids owns it, the same as writing their paths in agent order.
+    """
+
+    def __init__(self, agent_ids):
+        self.agent_ids = list(agent_ids)
+        self.slots = {agent_id: slot for slot, agent_id in enumerate(self.agent_ids)}
+        self.layers = []  # time_step -> {cell: bit mask of slots}
+        self.steps = defaultdict(set)  # cell -> time steps it is held at
+        self.version = 0  # Bumped on every change, lets callers reuse results
+
+    def layer(self, time_step):
+        layers = self.layers
+        while len(layers) <= time_step:
+            layers.append({})
+        return layers[time_step]
+
+    def reserve(self, cell, time_step, agent_id):
+        layer = self.layer(time_step)
+        layer[cell] = layer.get(cell, 0) | 1 << self.slots[agent_id]
+        self.steps[cell].add(time_step)
+        self.version += 1
+
+    def reserve_path(self, cells, start_step, agent_id):
+        for time_step, cell in enumerate(cells, start_step):
+            self.reserve(cell, time_step, agent_id)
+
+    def assign(self, cell, time_step, agent_id):
+        """
+        Give the cell to agent_id alone, dropping any other holder at that step.
+        """
+        self.layer(time_step)[cell] = 1 << self.slots[agent_id]
+        self.steps[cell].add(time_step)
+        self.version += 1
+
+    def horizon(self):
+        """
+        Return the first time step from which on nothing is reserved.
+        """
+        return len(self.layers)
+
+    def is_reserved(self, cell, time_step, agent_id):
+        # Reserved if another agent owns the cell at this time step
+        if time_step >= len(self.layers):
+            return False
+        mask = self.layers[time_step].get(cell)
+        return bool(mask) and mask.bit_length() - 1 != self.slots[agent_id]
+
+    def safe_intervals(self, cell, agent_id, first):
+        """
+        Return the maximal (start, end) ranges of time steps from first on in
+        which the cell is not reserved against agent_id. The last range is
+        open-ended, with end = math.inf.
+        """
+        intervals = []
+        start = first
+        for time_step in sorted(self.steps.get(cell, ())):
+            if time_step < start or not self.is_reserved(cell, time_step, agent_id):
+                continue
+            if time_step > start:
+                intervals.append((start, time_step - 1))
+            start = time_step + 1
+        intervals.append((start, math.inf))
+        return intervals
+
+    def copy(self):
+        table = ReservationTable(self.agent_ids)
+        table.layers = [dict(layer) for layer in self.layers]
+        table.steps = defaultdict(
+            set, {cell: set(steps) for cell, steps in self.steps.items()}
+        )
+        table.version = self.version
+        return table
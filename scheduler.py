@@ -0,0 +1,57 @@
+import time
+
+
+class StepScheduler:
+    """
+    Fixed-timestep scheduler for the simulation steps of run_game.
+
+    Steps run tick_rate times per second of wall time however long the frames
+    take: the steps a slow frame missed are run before the next frame is drawn,
+    so frames are skipped instead of the simulation slowing down. At most
+    max_steps are run per frame, past that the simulation falls behind rather
+    than never drawing again. In fast-forward steps run back to back until the
+    time of one frame is used up.
+    """
+
+    def __init__(self, tick_rate, frame_rate, max_steps):
+        self.step_time = 1 / tick_rate
+        self.frame_time = 1 / frame_rate
+        self.max_steps = max_steps
+        self.fast_forward = False
+        self.lag = 0.0  # Seconds of simulation owed
+        self.last_time = time.perf_counter()
+
+    def start(self):
+        """
+        Begin stepping, with the first step due one step from now.
+        """
+        self.lag = 0.0
+        self.last_time = time.perf_counter()
+
+    def run(self, step):
+        """
+        Call step() for every step due in this frame. Return False as soon as
+        step() does, to stop stepping, True otherwise.
+        """
+        now = time.perf_counter()
+        if self.fast_forward:
+            deadline = now + self.frame_time
+            while step():
+                if time.perf_counter() >= deadline:
+                    # Back to the tick rate from here when it is turned off
+                    self.start()
+                    return True
+            return False
+
+        self.lag += now - self.last_time
+        self.last_time = now
+        steps = 0
+        while self.lag >= self.step_time:
+            if steps == self.max_steps:
+                self.lag = 0.0  # Too far behind, drop the steps left
+                break
+            self.lag -= self.step_time
+            steps += 1
+            if not step():
+                return False
+        return True
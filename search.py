@@ -0,0 +1,374 @@
+import heapq
+import math
+from array import array
+from collections import defaultdict, deque
+from functools import partial
+
+# Frontier policies
+FIFO = "fifo"  # Breadth-first
+LIFO = "lifo"  # Depth-first
+PRIORITY = "priority"  # Lowest (f, g) first, on a binary heap
+BUCKET = "bucket"  # Lowest f first, then highest g, in a BucketQueue
+
+# When a state is closed
+CLOSE_ON_PUSH = "push"  # The first time it is reached
+CLOSE_ON_POP = "pop"  # The first time it is expanded
+LABELS = "labels"  # Never; only Pareto-optimal (g, time, fuel) labels are kept
+
+
+class BucketQueue:
+    """
+    Dial's bucket queue for the small non-negative integer f and g of the grid
+    searches. Entries are (f, g, state) and come out by lowest f, then highest
+    g (lowest h = f - g), so ties go to the states closest to the goal; equal
+    entries come out last in, first out.
+
+    Pushes and pops are O(1) amortized while f never drops below the last
+    popped value, which holds for consistent heuristics. A lower push is still
+    handled, it only moves the scan back.
+    """
+
+    def __init__(self):
+        self.buckets = []  # f -> h -> states, None where nothing was pushed
+        self.f = 0  # No entries below (f, h)
+        self.h = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry):
+        f, g, state = entry
+        h = f - g
+        buckets = self.buckets
+        if len(buckets) <= f:
+            buckets.extend([None] * (f + 1 - len(buckets)))
+        f_bucket = buckets[f]
+        if f_bucket is None:
+            f_bucket = buckets[f] = []
+        if len(f_bucket) <= h:
+            f_bucket.extend([None] * (h + 1 - len(f_bucket)))
+        if f_bucket[h] is None:
+            f_bucket[h] = [state]
+        else:
+            f_bucket[h].append(state)
+        if f < self.f or (f == self.f and h < self.h):
+            self.f, self.h = f, h
+        self.size += 1
+
+    def pop(self):
+        buckets = self.buckets
+        f, h = self.f, self.h
+        while True:
+            f_bucket = buckets[f]
+            if f_bucket is not None:
+                while h < len(f_bucket):
+                    if f_bucket[h]:
+                        self.f, self.h = f, h
+                        self.size -= 1
+                        return f, f - h, f_bucket[h].pop()
+                    h += 1
+                buckets[f] = None  # Emptied, free it
+            f, h = f + 1, 0
+
+
+class StepCost:
+    """
+    Every move costs one step and a state is just the cell index.
+    """
+
+    stride = 1  # state // stride is the cell
+
+    def __init__(self, grid):
+        self.neighbors = grid.neighbors
+
+    def start(self, cell):
+        return cell
+
+    def successors(self, state):
+        return self.neighbors[state]
+
+
+class TimeFuelCost:
+    """
+    Entering a cell uses its time cost and one unit of fuel, and a fuel station
+    fills the tank. Moves that run out of either are dropped.
+
+    A state packs the cell with the time and fuel left into one integer,
+    (cell * time_span + time_left) * fuel_span + fuel_left, so states order
+    like (cell, time_left, fuel_left) tuples at a fraction of their memory.
+    An unlimited resource (math.inf) never changes and is packed as 0.
+    """
+
+    def __init__(self, grid, time_limit, fuel_limit):
+        self.neighbors = grid.neighbors
+        self.fuel_station = grid.fuel_station
+        self.time_limit = time_limit
+        self.fuel_limit = fuel_limit
+        if math.isinf(time_limit):
+            self.time_span = 1
+            self.time_cost = array("i", [0]) * grid.size
+        else:
+            self.time_span = time_limit + 1
+            self.time_cost = grid.time_cost
+        if math.isinf(fuel_limit):
+            self.fuel_span = 1
+            self.fuel_used = 0  # Fuel taken by a move
+        else:
+            self.fuel_span = fuel_limit + 1
+            self.fuel_used = 1
+        self.cell_span = self.time_span * self.fuel_span  # States per cell
+        self.stride = self.cell_span
+
+    def start(self, cell):
+        return (cell + 1) * self.cell_span - 1  # Full time and fuel
+
+    def unpack(self, state):
+        """
+        Return (cell, time_left, fuel_left) of state.
+        """
+        cell, rest = divmod(state, self.cell_span)
+        time_left, fuel_left = divmod(rest, self.fuel_span)
+        if math.isinf(self.time_limit):
+            time_left = math.inf
+        if math.isinf(self.fuel_limit):
+            fuel_left = math.inf
+        return cell, time_left, fuel_left
+
+    def moves(self, state, next_cells):
+        """
+        Return the states reached from state by entering each of next_cells
+        that the time and fuel left allow.
+        """
+        time_left, fuel_left = divmod(state % self.cell_span, self.fuel_span)
+        time_cost = self.time_cost
+        fuel_station = self.fuel_station
+        fuel_used = self.fuel_used
+        fuel_full = self.fuel_span - 1
+        time_span = self.time_span
+        fuel_span = self.fuel_span
+        return [
+            (next_pos * time_span + time_left - time_cost[next_pos]) * fuel_span
+            + (fuel_full if fuel_station[next_pos] else fuel_left - fuel_used)
+            for next_pos in next_cells
+            if time_left >= time_cost[next_pos]
+            and (fuel_left >= fuel_used or fuel_station[next_pos])
+        ]
+
+    def successors(self, state):
+        return self.moves(state, self.neighbors[state // self.cell_span])
+
+
+class TimedCost(TimeFuelCost):
+    """
+    TimeFuelCost with the time step packed in as the lowest digit, for
+    searches against other agents' timed paths from time_step_start up to
+    horizon. Waiting in place is a move too and costs the same as entering
+    the cell again.
+    """
+
+    def __init__(self, grid, time_limit, fuel_limit, time_step_start, horizon):
+        super().__init__(grid, time_limit, fuel_limit)
+        self.time_step_start = time_step_start
+        self.step_span = max(horizon - time_step_start, 0) + 1
+        self.stride = self.cell_span * self.step_span
+
+    def start(self, cell):
+        return super().start(cell) * self.step_span
+
+    def unpack(self, state):
+        """
+        Return (cell, time_left, fuel_left, time_step) of state.
+        """
+        rest, step = divmod(state, self.step_span)
+        return (*super().unpack(rest), self.time_step_start + step)
+
+    def time_step(self, state):
+        return self.time_step_start + state % self.step_span
+
+    def successors(self, state):
+        rest, step = divmod(state, self.step_span)
+        cell = rest // self.cell_span
+        step_span = self.step_span
+        return [
+            next_rest * step_span + step + 1
+            for next_rest in self.moves(rest, self.neighbors[cell] + (cell,))
+        ]
+
+
+class BestFirstSearch:
+    """
+    The search loop shared by the single-agent searches of the Controller.
+
+    A search is configured by its frontier policy (FIFO, LIFO, PRIORITY or
+    BUCKET), a cost model that defines the integer states and their
+    successors, an optional heuristic (steps to the goal for a cell, -1 if
+    unreachable), and an optional allowed(state, next_state) check for moves
+    other agents rule out. LABELS needs the states of a TimeFuelCost. The
+    frontier holds (f, g, state) entries with f = g + h, or f = h alone for a
+    greedy search, which does not track g.
+
+    When states are plain cells the closed flags and parents live in arrays
+    preallocated for the grid; packed states are far too many for that, so
+    they are kept in dicts keyed by the state.
+    """
+
+    def __init__(
+        self,
+        grid,
+        stats,
+        cost_model,
+        frontier=PRIORITY,
+        closed=CLOSE_ON_PUSH,
+        heuristic=None,
+        greedy=False,
+        allowed=None,
+    ):
+        self.grid = grid
+        self.stats = stats  # SearchStats of the owning Controller
+        self.cost_model = cost_model
+        self.frontier = frontier
+        self.closed = closed
+        self.heuristic = heuristic
+        self.greedy = greedy
+        self.allowed = allowed
+
+    def insert_label(self, labels, state, g):
+        """
+        Record a (g, time_left, fuel_left) label for the cell of state, unless a label
+        already kept for that cell dominates it (no more steps, at least as much time
+        and fuel left). Labels dominated by the new one are dropped, so their
+        frontier entries are skipped when popped.
+        Return True if the label was kept.
+        """
+        # Packed time and fuel compare like the real ones
+        cell, rest = divmod(state, self.cost_model.cell_span)
+        time_left, fuel_left = divmod(rest, self.cost_model.fuel_span)
+        cell_labels = labels[cell]
+        for label in cell_labels:
+            if label[0] <= g and label[1] >= time_left and label[2] >= fuel_left:
+                return False
+
+        kept = []
+        for label in cell_labels:
+            if not (
+                g <= label[0] and time_left >= label[1] and fuel_left >= label[2]
+            ):
+                kept.append(label)
+        kept.append((g, time_left, fuel_left, state))
+        labels[cell] = kept
+        return True
+
+    def run(self, start, goal, stop=None, max_pops=None):
+        """
+        Search from the start cell until a state on the goal cell, or one for
+        which stop(state) is true, is taken off the frontier. Return the states
+        from start to that state, or None. max_pops caps the frontier pops.
+        """
+        cost_model = self.cost_model
+        stride = cost_model.stride
+        successors = cost_model.successors
+        heuristic = self.heuristic
+        greedy = self.greedy
+        allowed = self.allowed
+        close_on_push = self.closed == CLOSE_ON_PUSH
+        close_on_pop = self.closed == CLOSE_ON_POP
+        use_labels = self.closed == LABELS
+        insert_label = self.insert_label
+        if max_pops is None:
+            max_pops = math.inf
+
+        h = heuristic(start) if heuristic else 0
+        if h < 0:
+            return None
+        start_state = cost_model.start(start)
+        if stride == 1:
+            closed = bytearray(self.grid.size)
+            came_from = array("i", [-1]) * self.grid.size
+        else:
+            # Reading an unseen state stores a 0, but every such read is
+            # followed by closing the state anyway
+            closed = defaultdict(int)
+            came_from = {}
+        closed[start_state] = close_on_push
+        # LABELS: non-dominated labels per cell, at most one per state
+        labels = defaultdict(list)
+        if use_labels:
+            insert_label(labels, start_state, 0)
+
+        # FIFO and LIFO frontiers hold bare states, their order needs no f or g
+        ordered = self.frontier in (PRIORITY, BUCKET)
+        if self.frontier == PRIORITY:
+            frontier = [(h, 0, start_state)]
+            pop = partial(heapq.heappop, frontier)
+            push = partial(heapq.heappush, frontier)
+        elif self.frontier == BUCKET:
+            frontier = BucketQueue()
+            pop, push = frontier.pop, frontier.push
+            push((h, 0, start_state))
+        elif self.frontier == FIFO:
+            frontier = deque([start_state])
+            pop, push = frontier.popleft, frontier.append
+        else:
+            frontier = [start_state]
+            pop, push = frontier.pop, frontier.append
+
+        # Counted locally and added to stats once the search ends
+        pops = expanded_count = pushed_count = 0
+        try:
+            while frontier and pops < max_pops:
+                pops += 1
+                if ordered:
+                    _, g, state = pop()
+                else:
+                    g, state = 0, pop()
+                if use_labels:
+                    for label in labels[state // stride]:
+                        if label[3] == state:
+                            break
+                    else:
+                        continue  # Dominated after it was pushed
+                    if label[0] != g:
+                        continue  # Pushed again with fewer steps
+
+                if state // stride == goal or (stop is not None and stop(state)):
+                    path = [state]
+                    while state != start_state:
+                        state = came_from[state]
+                        path.append(state)
+                    return path[::-1]
+
+                if close_on_pop:
+                    if closed[state]:
+                        continue
+                    closed[state] = 1
+                expanded_count += 1
+
+                next_g = 0 if greedy else g + 1
+                for next_state in successors(state):
+                    if allowed is not None and not allowed(state, next_state):
+                        continue
+                    if heuristic:
+                        h = heuristic(next_state // stride)
+                        if h < 0:
+                            continue  # The goal cannot be reached from there
+
+                    if use_labels:
+                        if not insert_label(labels, next_state, next_g):
+                            continue
+                    elif closed[next_state]:
+                        continue
+                    elif close_on_push:
+                        closed[next_state] = 1
+                    came_from[next_state] = state
+
+                    if ordered:
+                        push((h if greedy else next_g + h, next_g, next_state))
+                    else:
+                        push(next_state)
+                    pushed_count += 1
+
+            return None
+        finally:
+            self.stats.expanded += expanded_count
+            self.stats.pushed += pushed_count
@@ -0,0 +1,197 @@
+from search import BucketQueue
+
+
+class SafeIntervalSearch:
+    """
+    Safe Interval Path Planning for one level-4 agent.
+
+    A search state is a cell together with one of its safe intervals, the
+    maximal runs of time steps in which no other agent has reserved the cell.
+    Waiting inside an interval creates no new states: a move to a neighbor is
+    made at the earliest step its interval allows, after waiting in place as
+    long as needed. Waiting still uses time and fuel like any other step, so
+    every state keeps the (arrival step, time left, fuel left) labels that no
+    other label of the same state can match after waiting. For the same reason
+    a move off a cell that is cheaper to wait on than the next one is also
+    made at every later step the intervals allow, up to the last reservation,
+    as waiting for an agent further ahead is only cheap there. Each of these
+    later arrivals is pushed once the one before it is popped, so those never
+    needed are never labelled.
+    """
+
+    def __init__(
+        self, grid, stats, reservations, agent_id, search, time_limit, fuel_limit
+    ):
+        self.grid = grid
+        self.stats = stats  # SearchStats of the owning Controller
+        self.reservations = reservations
+        self.agent_id = agent_id
+        self.search = search  # ResumableDistance toward the goal
+        self.time_limit = time_limit
+        self.fuel_limit = fuel_limit
+        self.intervals = {}  # cell -> safe intervals, computed on first use
+        self.first_step = 0
+
+    def safe_intervals(self, cell):
+        intervals = self.intervals.get(cell)
+        if intervals is None:
+            intervals = self.reservations.safe_intervals(
+                cell, self.agent_id, self.first_step
+            )
+            self.intervals[cell] = intervals
+        return intervals
+
+    def wait(self, cell, label, time_step):
+        """
+        Return (time_left, fuel_left) after waiting on cell from the step of
+        label until time_step.
+        """
+        steps = time_step - label[0]
+        if steps == 0:
+            return label[1], label[2]
+        fuel_left = label[2] - steps
+        if self.grid.fuel_station[cell]:
+            fuel_left = self.fuel_limit
+        return label[1] - steps * self.grid.time_cost[cell], fuel_left
+
+    def keep_label(self, labels, key, cell, label):
+        """
+        Record label for key unless an existing label can wait until its step
+        with at least as much time and fuel left. Return True if it was kept.
+        """
+        key_labels = labels.setdefault(key, [])
+        for other in key_labels:
+            if other[0] <= label[0]:
+                time_left, fuel_left = self.wait(cell, other, label[0])
+                if time_left >= label[1] and fuel_left >= label[2]:
+                    return False
+        kept = []
+        for other in key_labels:
+            if label[0] <= other[0]:
+                time_left, fuel_left = self.wait(cell, label, other[0])
+                if time_left >= other[1] and fuel_left >= other[2]:
+                    continue  # Dominated by the new label
+            kept.append(other)
+        kept.append(label)
+        labels[key] = kept
+        return True
+
+    def find_path(self, start, goal, time_step_start):
+        """
+        Return (cells, time_left, fuel_left) for the earliest arrival at goal,
+        with cells[0] = start at time_step_start and one cell per time step,
+        or None when the goal cannot be reached within the limits.
+        """
+        grid = self.grid
+        stats = self.stats
+        neighbors = grid.neighbors
+        time_costs = grid.time_cost
+        fuel_stations = grid.fuel_station
+        distance = self.search.distance
+        lookup = self.search.lookup
+        station_distance = grid.station_distance()
+        horizon = self.reservations.horizon()  # Nothing to wait for from here on
+        if lookup(start) < 0:
+            return None
+
+        self.first_step = time_step_start
+        self.intervals = {}
+
+        # The agent stands on the start now, even if the cell is reserved then
+        intervals = self.safe_intervals(start)
+        if intervals[0][0] == time_step_start + 1:
+            intervals[0] = (time_step_start, intervals[0][1])
+        elif intervals[0][0] != time_step_start:
+            intervals.insert(0, (time_step_start, time_step_start))
+
+        start_label = (time_step_start, self.time_limit, self.fuel_limit)
+        start_key = (start, 0)
+        labels = {}
+        came_from = {}
+        # (state of a later arrival) -> (parent key, parent label, h, latest step)
+        later = {}
+        self.keep_label(labels, start_key, start, start_label)
+        # Ordered by f = steps + h, ties going to the later arrival
+        pq = BucketQueue()
+        pq.push((lookup(start), 0, (start, 0, start_label)))
+
+        def arrive(key, label, next_key, h, arrival, latest):
+            """
+            Push the first label of next_key from arrival to latest that is
+            within the limits and not dominated, after waiting on the cell of key.
+            """
+            current, next_pos = key[0], next_key[0]
+            for arrival in range(arrival, latest + 1):
+                time_left, fuel_left = self.wait(current, label, arrival - 1)
+                if fuel_left < 0:
+                    return  # Ran dry while waiting
+                time_left -= time_costs[next_pos]
+                fuel_left -= 1
+                if fuel_stations[next_pos]:
+                    fuel_left = self.fuel_limit
+                if fuel_left < 0 or time_left < h:
+                    return  # Every step costs at least one unit of time
+                if fuel_left < h:
+                    # Not enough fuel for the goal, a station has to come first
+                    to_station = station_distance[next_pos]
+                    if to_station < 0 or fuel_left < to_station - 1:
+                        return
+
+                next_label = (arrival, time_left, fuel_left)
+                if self.keep_label(labels, next_key, next_pos, next_label):
+                    came_from[(next_key, next_label)] = (key, label)
+                    if arrival < latest:
+                        later[(next_key, next_label)] = (key, label, h, latest)
+                    steps = arrival - time_step_start
+                    pq.push((steps + h, steps, (*next_key, next_label)))
+                    stats.pushed += 1
+                    return
+
+        while pq:
+            _, steps, (current, interval, label) = pq.pop()
+            time_step = time_step_start + steps
+            key = (current, interval)
+            parent = later.pop((key, label), None)
+            if parent is not None:
+                # The same move one step later, kept back until now
+                arrive(*parent[:2], key, parent[2], time_step + 1, parent[3])
+            if label not in labels[key]:
+                continue  # Dominated after it was pushed
+
+            if current == goal:
+                cells = [current]
+                state = (key, label)
+                while state in came_from:
+                    parent = came_from[state]
+                    # Waited on the parent cell until the step before this arrival
+                    cells += [parent[0][0]] * (state[1][0] - parent[1][0])
+                    state = parent
+                return cells[::-1], label[1], label[2]
+            stats.expanded += 1
+
+            interval_end = self.intervals[current][interval][1]
+            for next_pos in neighbors[current]:
+                h = distance[next_pos]
+                if h < 0:
+                    h = lookup(next_pos)
+                    if h < 0:
+                        continue
+
+                for next_interval, (start_step, end_step) in enumerate(
+                    self.safe_intervals(next_pos)
+                ):
+                    if start_step > interval_end + 1:
+                        break  # Would have to wait past the end of our interval
+                    if end_step < time_step + 1:
+                        continue
+                    earliest = max(time_step + 1, start_step)
+                    latest = earliest
+                    if time_costs[current] < time_costs[next_pos] or (
+                        fuel_stations[current] and not fuel_stations[next_pos]
+                    ):
+                        latest = min(
+                            interval_end + 1, end_step, max(earliest, horizon)
+                        )
+                    arrive(key, label, (next_pos, next_interval), h, earliest, latest)
+
+        return None
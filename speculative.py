@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from grid import ResumableDistance
+from reservations import ReservationTable
+from sipp import SafeIntervalSearch
+
+
+class WorkerStats:
+    """
+    Search counters of one worker process, sent back with every plan.
+    """
+
+    def __init__(self):
+        self.expanded = 0
+        self.pushed = 0
+
+
+# Inputs shared by every plan of the current round, set in each worker process
+_round = None
+
+
+def start_worker(grid, reservations, time_limit, fuel_limit, time_step_start):
+    global _round
+    _round = (grid, reservations, time_limit, fuel_limit, time_step_start)
+
+
+def plan_agent(job):
+    """
+    Plan one agent from an (agent_id, start, goal) job, the way
+    Controller.a_star_multi does. Return (job, result, out_of_reach, expanded,
+    pushed), where result is (cells, time_left, fuel_left) or None and
+    out_of_reach tells that the goal cannot be reached even on an empty map.
+    """
+    grid, reservations, time_limit, fuel_limit, time_step_start = _round
+    agent_id, start, goal = job
+    stats = WorkerStats()
+    search = SafeIntervalSearch(
+        grid,
+        stats,
+        reservations,
+        agent_id,
+        ResumableDistance(grid, goal),
+        time_limit,
+        fuel_limit,
+    )
+    result = search.find_path(start, goal, time_step_start)
+    out_of_reach = False
+    if result is None:
+        search.reservations = ReservationTable([agent_id])
+        out_of_reach = search.find_path(start, goal, time_step_start) is None
+    return job, result, out_of_reach, stats.expanded, stats.pushed
+
+
+def fits(cells, reservations, agent_id, time_step_start):
+    """
+    Return True if no cell of a plan made from time_step_start is reserved
+    against agent_id. The start cell is not checked, the agent is already there.
+    """
+    is_reserved = reservations.is_reserved
+    for time_step, cell in enumerate(cells, time_step_start):
+        if time_step > time_step_start and is_reserved(cell, time_step, agent_id):
+            return False
+    return True
+
+
+def plan_speculatively(
+    grid, jobs, reservations, time_limit, fuel_limit, time_step_start, workers
+):
+    """
+    Plan every (agent_id, start, goal) job against the same reservations in a
+    pool of worker processes. Return the plan_agent results in job order.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=start_worker,
+        initargs=(grid, reservations, time_limit, fuel_limit, time_step_start),
+    ) as pool:
+        # A few chunks per worker keeps the load even with few round trips
+        chunksize = max(1, len(jobs) // (workers * 4))
+        return list(pool.map(plan_agent, jobs, chunksize=chunksize))
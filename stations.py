@@ -0,0 +1,162 @@
+import heapq
+from collections import defaultdict
+
+
+def keep_label(labels, key, steps, time_used):
+    """
+    Keep a (steps, time_used) label for key unless an existing one dominates it.
+    Return True if the label was kept.
+    """
+    key_labels = labels[key]
+    for label in key_labels:
+        if label[0] <= steps and label[1] <= time_used:
+            return False
+    labels[key] = [
+        label
+        for label in key_labels
+        if not (steps <= label[0] and time_used <= label[1])
+    ] + [(steps, time_used)]
+    return True
+
+
+class StationGraph:
+    """
+    Level-3 abstraction over the start, the goal and every fuel station.
+
+    Fuel is refilled at every F cell, so a route is a chain of legs between
+    these key cells, each leg no longer than the fuel limit. Every edge holds
+    the Pareto-optimal (steps, time) legs between two key cells that do not
+    pass through another station; the route search then runs on this small
+    graph and the chosen legs are expanded back into grid cells.
+    """
+
+    def __init__(self, grid, start, goal, time_limit, fuel_limit, stats):
+        self.grid = grid
+        self.stats = stats  # SearchStats of the owning Controller
+        self.start = start
+        self.goal = goal
+        self.time_limit = time_limit
+        self.fuel_limit = fuel_limit
+
+        self.terminals = {
+            index for index in range(grid.size) if grid.fuel_station[index]
+        }
+        self.terminals.add(goal)
+
+        # Exact steps to the goal; every step costs at least one unit of time too
+        self.distance = grid.distance_field(goal)
+
+        # Edges are built the first time the route search reaches a node and are
+        # kept for later solves on the same graph
+        self.edges = {}  # node -> list of (next_node, steps, time, leg_end_state)
+        self.came_from = {}  # node -> parent pointers of its leg search
+
+    def build_edges(self, source):
+        """
+        Search every leg leaving source, stopping at stations and at the goal.
+        """
+        grid = self.grid
+        neighbors = grid.neighbors
+        time_costs = grid.time_cost
+        fuel_stations = grid.fuel_station
+        distance = self.distance
+        stats = self.stats
+        labels = defaultdict(list)
+        came_from = {}
+        edges = []
+
+        keep_label(labels, source, 0, 0)
+        pq = [(0, 0, source)]
+        while pq:
+            steps, time_used, current = heapq.heappop(pq)
+            if (steps, time_used) not in labels[current]:
+                continue  # Dominated after it was pushed
+            stats.expanded += 1
+
+            if current != source and current in self.terminals:
+                edges.append((current, steps, time_used, (current, steps, time_used)))
+                continue  # Legs end at the first station (or the goal) they reach
+
+            for next_pos in neighbors[current]:
+                next_time = time_used + time_costs[next_pos]
+                if next_pos == source or distance[next_pos] < 0:
+                    continue
+                if next_time + distance[next_pos] > self.time_limit:
+                    continue  # Cannot reach the goal in time from there
+                # With an empty tank the only move left is onto a station
+                if steps >= self.fuel_limit and not fuel_stations[next_pos]:
+                    continue
+                if keep_label(labels, next_pos, steps + 1, next_time):
+                    came_from[(next_pos, steps + 1, next_time)] = (
+                        current,
+                        steps,
+                        time_used,
+                    )
+                    heapq.heappush(pq, (steps + 1, next_time, next_pos))
+                    stats.pushed += 1
+
+        self.edges[source] = edges
+        self.came_from[source] = came_from
+
+    def leg_cells(self, source, end_state):
+        came_from = self.came_from[source]
+        cells = []
+        state = end_state
+        while state in came_from:
+            cells.append(state[0])
+            state = came_from[state]
+        return cells[::-1]  # Excludes the source cell
+
+    def solve(self):
+        """
+        Return the fewest-steps route as a list of cell indices, or None.
+        """
+        # Exact steps to the goal, admissible on the graph as well
+        distance = self.distance
+        if distance[self.start] < 0:
+            return None
+
+        labels = defaultdict(list)
+        came_from = {}
+        keep_label(labels, self.start, 0, 0)
+        pq = [(distance[self.start], 0, 0, self.start)]
+        while pq:
+            _, steps, time_used, node = heapq.heappop(pq)
+            if (steps, time_used) not in labels[node]:
+                continue
+
+            if node == self.goal:
+                return self.expand((node, steps, time_used), came_from)
+            self.stats.expanded += 1
+
+            if node not in self.edges:
+                self.build_edges(node)
+            for next_node, leg_steps, leg_time, leg_end in self.edges[node]:
+                new_steps = steps + leg_steps
+                new_time = time_used + leg_time
+                if new_time > self.time_limit:
+                    continue
+                if keep_label(labels, next_node, new_steps, new_time):
+                    came_from[(next_node, new_steps, new_time)] = (
+                        (node, steps, time_used),
+                        leg_end,
+                    )
+                    heapq.heappush(
+                        pq,
+                        (new_steps + distance[next_node], new_steps, new_time, next_node),
+                    )
+                    self.stats.pushed += 1
+
+        return None
+
+    def expand(self, state, came_from):
+        legs = []
+        while state in came_from:
+            parent, leg_end = came_from[state]
+            legs.append((parent[0], leg_end))
+            state = parent
+
+        path = [self.start]
+        for source, leg_end in reversed(legs):
+            path += self.leg_cells(source, leg_end)
+        return path